@@ -0,0 +1,350 @@
+# coding: utf-8
+r"""
+公式余额重算
+- 批量版的 excel宏/计算公式余额和公式校验：文件夹（含子文件夹）内每个工作簿的每张“提取”表重算 公式余额、公式校验
+- 规则与宏相同：
+  - 首行 公式余额 = 首行 余额；其后 公式余额 = 上一行公式余额 + 本行净流（按行顺序累加，与宏的逐格相加结果一致）
+  - 公式校验 = 余额 − 公式余额
+  - 遇到 净流 或 余额 为空的行即停止，该行及以后保持原值
+  - 只处理到最后一个 余额/净流 非空的行（宏的 lastRow），表尾的空行不算中断
+- 与宏的不同：
+  - 有 本账号 列时按账号分别累加（各账号各自取首行余额作起点、各自遇空停止）
+  - 处理全部数据行，不区分筛选隐藏的行
+  - 净流/余额 为无法识别为数字的文字时按空值处理（宏会报类型不匹配）
+- 列按表头名称定位（第 1 行），不要求相邻
+- 写出：只读模式读出全部工作表，write_only 模式流式写出，先写临时文件再原子替换；
+  公式、数值、日期保留，单元格格式、列宽、合并单元格、筛选与隐藏行不保留（所有工作表都是如此）
+  - 默认写到 <文件夹>/公式余额重算结果/ 下的同名相对路径，原文件不动
+  - --in-place 才覆盖原文件，首次覆盖前在原处保留 <文件名>.bak 副本（已有 .bak 时不再覆盖）
+  - 结果与原值完全相同的文件不写出
+- 净流/余额 本身是公式时，取 Excel 上次保存的计算结果参与累加
+- 并行：默认进程池（--executor thread 可退回线程池），--workers 指定并发数
+- 汇总：有“遇空停止”或重算后仍有非零公式校验（|差异| > 0.005）的文件写入 公式余额重算汇总.xlsx
+
+用法：
+    python 公式余额重算.py [--executor process|thread] [--workers N] [--dry-run] [--in-place]
+
+依赖：numpy, pandas, openpyxl
+"""
+
+import os
+import shutil
+import argparse
+import functools
+import warnings
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook, Workbook
+
+from 并行读取 import add_parallel_arguments, iter_parallel
+from 余额核对 import DIFF_TOLERANCE
+
+warnings.filterwarnings(
+    "ignore",
+    message="Workbook contains no default style",
+    category=UserWarning,
+)
+
+SHEET_KEYWORD = '提取'
+NET_COLUMN = '净流'
+BALANCE_COLUMN = '余额'
+FORMULA_BALANCE_COLUMN = '公式余额'
+CHECK_COLUMN = '公式校验'
+ACCOUNT_COLUMN = '本账号'
+SUMMARY_FILE_NAME = '公式余额重算汇总.xlsx'
+OUTPUT_DIR = '公式余额重算结果'
+BACKUP_SUFFIX = '.bak'
+SUPPORTED_SUFFIXES = ('.xlsx',)  # write_only 重写会丢掉 .xlsm 的宏；.xls 需另存为 .xlsx
+
+
+# =========================
+# 重算
+# =========================
+def to_numbers(values) -> np.ndarray:
+    """单元格值 -> float64；空、空白文字、无法识别的文字记为 NaN。"""
+    out = np.full(len(values), np.nan)
+    for i, v in enumerate(values):
+        if v is None or isinstance(v, bool):
+            continue
+        if isinstance(v, (int, float)):
+            out[i] = v
+            continue
+        try:
+            out[i] = float(str(v).strip().replace(',', ''))
+        except ValueError:
+            pass
+    return out
+
+
+def account_groups(accounts) -> list[np.ndarray]:
+    """按账号分组的行下标（组内保持原行顺序，组按首次出现的先后）。"""
+    keys = pd.Series([str(a).strip() if a is not None else '' for a in accounts])
+    codes, _ = pd.factorize(keys)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.flatnonzero(np.diff(codes[order])) + 1
+    return np.split(order, bounds)
+
+
+def recompute(net: np.ndarray, balance: np.ndarray, groups: list[np.ndarray]):
+    """
+    按组重算，返回 (公式余额, 公式校验, 已填行掩码, 中断行下标列表)。
+    每组：首行余额为起点，净流按行 cumsum；遇 净流 或 余额 为 NaN 的行停止（首行只要求余额非空）。
+    """
+    n = len(net)
+    formula_balance = np.full(n, np.nan)
+    check = np.full(n, np.nan)
+    filled = np.zeros(n, dtype=bool)
+    breaks = []
+    for rows in groups:
+        if not len(rows):
+            continue
+        blank = np.isnan(net[rows]) | np.isnan(balance[rows])
+        blank[0] = np.isnan(balance[rows[0]])
+        stop = int(np.argmax(blank)) if blank.any() else len(rows)
+        if stop < len(rows):
+            breaks.append(int(rows[stop]))
+        if stop == 0:
+            continue
+        seg = rows[:stop]
+        steps = net[seg].copy()
+        steps[0] = balance[seg[0]]
+        formula_balance[seg] = np.cumsum(steps)
+        check[seg] = balance[seg] - formula_balance[seg]
+        filled[seg] = True
+    return formula_balance, check, filled, sorted(breaks)
+
+
+def _is_blank(v) -> bool:
+    return v is None or (isinstance(v, str) and not v.strip())
+
+
+def last_data_row(rows: list[list], columns) -> int:
+    """最后一个在 columns 任一列有非空值的行下标；全空返回 -1。"""
+    for k in range(len(rows) - 1, -1, -1):
+        row = rows[k]
+        if any(i < len(row) and not _is_blank(row[i]) for i in columns):
+            return k
+    return -1
+
+
+def _column_values(rows: list[list], idx: int) -> list:
+    return [r[idx] if idx < len(r) else None for r in rows]
+
+
+def _is_formula(v) -> bool:
+    return isinstance(v, str) and v.startswith('=')
+
+
+def recompute_sheet(rows: list[list], load_cached=None) -> dict | None:
+    """
+    对一张提取表（rows[0] 为表头，可原地修改）重算；缺少必要列时返回 None。
+    load_cached()：返回同一张表的 data_only 读出结果，净流/余额中有公式时才调用。
+    返回统计：行数、中断行（Excel 行号）、重算后非零差异的行数/首行/最大差异、是否有改动。
+    """
+    if not rows:
+        return None
+    header = [str(h).strip() if h is not None else '' for h in rows[0]]
+    try:
+        i_net, i_bal = header.index(NET_COLUMN), header.index(BALANCE_COLUMN)
+        i_fb, i_chk = header.index(FORMULA_BALANCE_COLUMN), header.index(CHECK_COLUMN)
+    except ValueError:
+        return None
+    i_acc = header.index(ACCOUNT_COLUMN) if ACCOUNT_COLUMN in header else None
+
+    body = rows[1:]
+    source = body
+    if load_cached and any(_is_formula(v) for i in (i_net, i_bal) for v in _column_values(body, i)):
+        source = load_cached()[1:]
+    # 与宏的 lastRow 相同：只处理到最后一个 余额/净流 非空的行，表尾带格式的空行不算“遇空停止”
+    last = last_data_row(source, (i_net, i_bal))
+    body, source = body[:last + 1], source[:last + 1]
+    net = to_numbers(_column_values(source, i_net))
+    balance = to_numbers(_column_values(source, i_bal))
+    groups = account_groups(_column_values(body, i_acc)) if i_acc is not None else [np.arange(len(body))]
+    formula_balance, check, filled, breaks = recompute(net, balance, groups)
+
+    width = max(i_fb, i_chk) + 1
+    changed = False
+    for k in np.flatnonzero(filled):
+        row = body[k]
+        if len(row) < width:
+            row.extend([None] * (width - len(row)))
+        new_fb, new_chk = float(formula_balance[k]), float(check[k])
+        if row[i_fb] != new_fb or row[i_chk] != new_chk:
+            row[i_fb], row[i_chk] = new_fb, new_chk
+            changed = True
+
+    diff_rows = np.flatnonzero(filled & (np.abs(np.nan_to_num(check)) > DIFF_TOLERANCE))
+    max_diff = None
+    if len(diff_rows):
+        max_diff = float(check[diff_rows[np.argmax(np.abs(check[diff_rows]))]])
+    return {
+        '行数': len(body),
+        '中断行': [b + 2 for b in breaks],  # Excel 行号：表头占第 1 行
+        '差异行数': int(len(diff_rows)),
+        '首个差异行': int(diff_rows[0]) + 2 if len(diff_rows) else None,
+        '最大差异': max_diff,
+        'changed': changed,
+    }
+
+
+# =========================
+# 单个工作簿（进程池中执行）
+# =========================
+def _sheet_rows(ws) -> list[list]:
+    # 只读模式默认信任表内的 <dimension> 标记，标记过期时会少读行列；清掉后按实际内容读到底
+    ws.reset_dimensions()
+    return [list(r) for r in ws.iter_rows(values_only=True)]
+
+
+def read_sheets(path: Path, data_only: bool = False) -> tuple[list[tuple[str, list[list]]], int]:
+    """只读模式读出全部工作表 ([(表名, 行)], 活动表下标)；公式按原文保留（data_only=False）。"""
+    wb = load_workbook(path, read_only=True, data_only=data_only)
+    try:
+        sheets = [(ws.title, _sheet_rows(ws)) for ws in wb.worksheets]
+        active = wb.worksheets.index(wb.active) if wb.active in wb.worksheets else 0
+    finally:
+        wb.close()
+    return sheets, active
+
+
+def write_sheets(path: Path, sheets: list[tuple[str, list[list]]], active: int = 0) -> None:
+    """write_only 模式写出全部行，先写临时文件再原子替换。"""
+    wb = Workbook(write_only=True)
+    for title, rows in sheets:
+        ws = wb.create_sheet(title)
+        for row in rows:
+            ws.append(row)
+    wb.active = active
+    tmp_path = path.with_suffix('.tmp.xlsx')
+    wb.save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def process_workbook(path: Path, output_path: Path | None = None, dry_run: bool = False) -> dict:
+    """
+    重算一个工作簿内所有提取表并写到 output_path；output_path 为空表示覆盖原文件（先复制出 .bak 备份）。
+    返回 {'sheets': [(表名, 统计)], 'written': bool, 'error': str|None}。
+    """
+    try:
+        sheets, active = read_sheets(path)
+        cached = []
+
+        def load_cached(idx):
+            # 净流/余额是公式时再读一次计算结果；整本只读一次，多张提取表共用
+            if not cached:
+                cached.append(read_sheets(path, data_only=True)[0])
+            return cached[0][idx][1]
+
+        results = []
+        for idx, (title, rows) in enumerate(sheets):
+            if SHEET_KEYWORD not in title:
+                continue
+            stats = recompute_sheet(rows, functools.partial(load_cached, idx))
+            if stats is not None:
+                results.append((title, stats))
+        written = any(st['changed'] for _, st in results)
+        if written and not dry_run:
+            if output_path is None:
+                backup = path.with_name(path.name + BACKUP_SUFFIX)
+                if not backup.exists():  # 已有备份时保留最早的原件
+                    shutil.copy2(path, backup)
+                output_path = path
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            write_sheets(output_path, sheets, active)
+        return {'sheets': results, 'written': written and not dry_run, 'error': None}
+    except Exception as e:
+        return {'sheets': [], 'written': False, 'error': f'{type(e).__name__}: {e}'}
+
+
+# =========================
+# 主流程
+# =========================
+def find_workbooks(root: Path) -> list[Path]:
+    files = []
+    for p in sorted(root.rglob('*')):
+        if not p.is_file() or p.name.startswith('~$') or p.name == SUMMARY_FILE_NAME:
+            continue
+        if p.relative_to(root).parts[0] == OUTPUT_DIR:
+            continue  # 上次的输出
+        if p.suffix.lower() in SUPPORTED_SUFFIXES and not p.name.endswith('.tmp.xlsx'):
+            files.append(p)
+    return files
+
+
+def summary_rows(root: Path, path: Path, result: dict) -> list[dict]:
+    """有中断或差异的提取表各一行；读取失败的文件一行。"""
+    rel = str(path.relative_to(root))
+    if result['error']:
+        return [{'文件': rel, '工作表': '', '说明': f"读取失败：{result['error']}"}]
+    out = []
+    for title, st in result['sheets']:
+        if not st['中断行'] and not st['差异行数']:
+            continue
+        notes = []
+        if st['中断行']:
+            notes.append('遇空停止于第 ' + '、'.join(map(str, st['中断行'])) + ' 行')
+        if st['差异行数']:
+            notes.append(f"{st['差异行数']} 行公式校验非零")
+        out.append({
+            '文件': rel, '工作表': title, '行数': st['行数'],
+            '中断行': '、'.join(map(str, st['中断行'])),
+            '差异行数': st['差异行数'], '首个差异行': st['首个差异行'], '最大差异': st['最大差异'],
+            '说明': '；'.join(notes),
+        })
+    return out
+
+
+def process_in_folder(path: Path, root: Path, in_place: bool = False, dry_run: bool = False) -> dict:
+    """进程池任务：按相对路径定出写出位置后调用 process_workbook（顶层函数，可被 pickle）。"""
+    output_path = None if in_place else root / OUTPUT_DIR / path.relative_to(root)
+    return process_workbook(path, output_path, dry_run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="公式余额重算：批量重算提取表的公式余额与公式校验")
+    parser.add_argument('--dry-run', action='store_true', help='只统计中断与差异，不写出文件')
+    parser.add_argument('--in-place', action='store_true',
+                        help=f'覆盖原文件（原文件另存为 *{BACKUP_SUFFIX}）；默认写到 {OUTPUT_DIR} 文件夹')
+    add_parallel_arguments(parser)
+    args = parser.parse_args()
+
+    folder = input("请输入提取表所在文件夹路径：").strip().strip('"')
+    root = Path(folder)
+    if not root.is_dir():
+        print("输入的路径不存在或不是文件夹，请检查路径。")
+        return
+    files = find_workbooks(root)
+    if not files:
+        print("没有找到 .xlsx 文件。")
+        return
+    print(f"共找到 {len(files)} 个工作簿，开始重算……")
+
+    rows = []
+    written = sheets = 0
+    for i, (path, result) in enumerate(
+            iter_parallel(functools.partial(process_in_folder, root=root, in_place=args.in_place,
+                                            dry_run=args.dry_run), files,
+                          args.executor, args.workers), start=1):
+        sheets += len(result['sheets'])
+        written += result['written']
+        rows.extend(summary_rows(root, path, result))
+        state = '失败' if result['error'] else ('已写出' if result['written'] else '无变化')
+        print(f"[{i}/{len(files)}] {state}：{path.relative_to(root)}")
+
+    summary_path = root / SUMMARY_FILE_NAME
+    if rows:
+        pd.DataFrame(rows).sort_values(['文件', '工作表']).to_excel(summary_path, index=False)
+        print(f"有中断/差异/失败的记录 {len(rows)} 条，已写入：{summary_path}")
+    else:
+        print("所有提取表均连续且公式校验为零。")
+    target = '覆盖原文件（已留 .bak 备份）' if args.in_place else f'写到 {root / OUTPUT_DIR}'
+    print(f"完成：提取表 {sheets} 张，{target} {written} 个。")
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()  # PyInstaller 打包后进程池需要
+    main()
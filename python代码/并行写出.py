@@ -0,0 +1,90 @@
+# coding: utf-8
+r"""
+并行写出
+- “每组一个工作簿”的写出交给进程池：xlsxwriter 序列化是纯 Python 的 CPU 活，多线程会被 GIL 卡住
+- 文件名在主进程按分组顺序先定好（重名依次加 _2、_3…），子进程只负责写，结果与串行一致
+- 所有工作簿共用的大参数（shared）经进程池 initializer 每个子进程只传一次
+- workers=1 或只有一个工作簿时直接在当前进程串行写出，不起进程池
+- 进程数：默认取 CPU 数，不超过任务数，最大 61（Windows 进程池上限）
+- Windows 下子进程会重新导入主脚本：调用方必须放在 if __name__ == '__main__': 之下，
+  且 write_func 必须是模块顶层函数（可被 pickle）
+
+依赖：无（标准库）
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+WIN_PROCESS_CAP = 61
+
+
+def decide_worker_count(num_tasks: int, workers: int | None = None) -> int:
+    """根据 CPU 与任务数决定进程数；workers 为空或 0 时自动。"""
+    if num_tasks <= 1:
+        return 1
+    n = workers or os.cpu_count() or 4
+    return max(1, min(WIN_PROCESS_CAP, n, num_tasks))
+
+
+def unique_file_names(names: list[str]) -> list[str]:
+    """按顺序去重：后出现的同名文件依次加 _2、_3…（不区分大小写，兼容 Windows 文件系统）。"""
+    seen = set()
+    out = []
+    for name in names:
+        base, ext = os.path.splitext(name)
+        candidate, k = name, 2
+        while candidate.lower() in seen:
+            candidate = f"{base}_{k}{ext}"
+            k += 1
+        seen.add(candidate.lower())
+        out.append(candidate)
+    return out
+
+
+_shared_kwargs = {}
+
+
+def _init_shared(shared: dict) -> None:
+    """进程池 initializer：每个子进程只接收一次各任务共用的参数。"""
+    global _shared_kwargs
+    _shared_kwargs = shared
+
+
+def _write_with_shared(write_func, *task):
+    return write_func(*task, **_shared_kwargs)
+
+
+def emit_workbooks(write_func, tasks: list[tuple], workers: int | None = None, on_done=None,
+                   shared: dict | None = None) -> None:
+    """
+    并行执行 write_func(*task, **shared)，task[0] 约定为输出文件路径。
+    同时在途的任务数限制为进程数的 2 倍，避免一次性把所有分组数据都序列化进队列。
+    shared：所有任务相同的关键字参数（如每个工作簿都附带的整张原表），每个子进程只传一次，不随任务重复序列化。
+    on_done(output_file_path) 在每个工作簿写完后于主进程回调（可用于打印进度）。
+    """
+    shared = shared or {}
+    n = decide_worker_count(len(tasks), workers)
+    if n == 1:
+        for task in tasks:
+            write_func(*task, **shared)
+            if on_done:
+                on_done(task[0])
+        return
+
+    pending = {}
+    task_iter = iter(tasks)
+    with ProcessPoolExecutor(max_workers=n, initializer=_init_shared, initargs=(shared,)) as pool:
+        while True:
+            while len(pending) < n * 2:
+                task = next(task_iter, None)
+                if task is None:
+                    break
+                pending[pool.submit(_write_with_shared, write_func, *task)] = task[0]
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                path = pending.pop(fut)
+                fut.result()  # 子进程异常在主进程重新抛出
+                if on_done:
+                    on_done(path)
@@ -0,0 +1,79 @@
+# coding: utf-8
+r"""
+并行读取
+- 批量解析工作簿（openpyxl/pandas 解析 xlsx 是纯 Python 的 CPU 活），默认交给进程池，绕开 GIL
+- 子进程只返回精简结果（DataFrame 以 pickle 的列缓冲回传，查重只回传账号/卡号列表），主进程负责打印与汇总
+- return_exceptions=True：单个文件出错（含子进程崩溃）时把异常作为结果回传，其余文件照常处理
+- executor='thread' 保留原来的线程池方式（调试或单核机器时使用）
+- 进程数：默认取 CPU 数，不超过文件数，最大 61（Windows 进程池上限），见 并行写出.decide_worker_count
+- Windows 下子进程会重新导入主脚本：调用方必须放在 if __name__ == '__main__': 之下，
+  且 func 必须是模块顶层函数（可被 pickle）
+
+依赖：无（标准库）
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, BrokenExecutor, FIRST_COMPLETED, wait
+
+from 并行写出 import decide_worker_count
+
+EXECUTORS = ('process', 'thread')
+
+
+def add_parallel_arguments(parser, default_executor: str = 'process') -> None:
+    """给已有的 argparse 解析器加上 --executor / --workers 参数。"""
+    parser.add_argument('--executor', choices=EXECUTORS, default=default_executor,
+                        help='并行方式：process 进程池（默认）/ thread 线程池')
+    parser.add_argument('--workers', type=int, default=0, help='并发进程/线程数，0 为自动')
+
+
+def iter_parallel(func, items, executor: str = 'process', workers: int | None = None,
+                  return_exceptions: bool = False):
+    """
+    并行执行 func(item)，按完成顺序产出 (item, result)。
+    同时在途的任务数限制为并发数的 2 倍；只有一个任务或 workers=1 时在当前进程串行执行。
+    return_exceptions=True 时单个任务的异常作为 result 产出、不中断其余任务；
+    子进程崩溃导致进程池损坏（BrokenProcessPool）时，在途任务各自得到该异常，余下任务换新进程池继续。
+    """
+    items = list(items)
+    n = decide_worker_count(len(items), workers)
+    if n == 1:
+        for item in items:
+            try:
+                result = func(item)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                result = e
+            yield item, result
+        return
+
+    pool_cls = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    pending = {}
+    item_iter = iter(items)
+    pool = pool_cls(max_workers=n)
+    try:
+        while True:
+            while len(pending) < n * 2:
+                item = next(item_iter, None)
+                if item is None:
+                    break
+                try:
+                    fut = pool.submit(func, item)
+                except BrokenExecutor:
+                    if not return_exceptions:
+                        raise
+                    pool.shutdown(wait=False)
+                    pool = pool_cls(max_workers=n)
+                    fut = pool.submit(func, item)
+                pending[fut] = item
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                item = pending.pop(fut)
+                if return_exceptions and fut.exception() is not None:
+                    yield item, fut.exception()
+                else:
+                    yield item, fut.result()
+    finally:
+        pool.shutdown()
@@ -0,0 +1,115 @@
+# coding: utf-8
+r"""
+数字匹配索引
+- “数字匹配”：只比较两侧的数字序列，相等即匹配；否则较短者长度 >= min_len 且是较长者的子串时匹配
+  （一家银行给 19 位卡号、另一家给 12 位以上账号尾段的情况）
+- DigitIndex 收录大量账号/卡号，查询时不再逐条比较：
+  - 精确：字典
+  - 包含查询串的号码：所有长度 >= min_len 的后缀排序成表，二分查找前缀区间
+  - 被查询串包含的号码：枚举查询串中长度为已收录长度的子串，查字典
+- 查询耗时只和查询串长度、命中数有关，与收录的号码数量基本无关（排序表二分为 log n）
+
+用法示例：
+    idx = DigitIndex(min_len=12)
+    idx.add('6222 0212 3456 7890 123', item=0)
+    idx.match('021234567890')   # -> {0}
+
+依赖：无（标准库）
+"""
+
+import re
+from bisect import bisect_left, insort
+
+NON_DIGIT = re.compile(r'\D')
+DEFAULT_MIN_LEN = 12
+_PREFIX_END = ':'  # 紧跟在 '9' 之后的字符，前缀区间的右边界
+INSORT_LIMIT = 256  # 待合并的后缀不超过这个数时逐个插入，否则整表重排
+
+
+def digits_only(value) -> str:
+    """提取数字序列；None/空 -> ''。"""
+    if value is None:
+        return ''
+    return NON_DIGIT.sub('', str(value))
+
+
+class DigitIndex:
+    """
+    号码 -> 条目 的数字匹配索引。item 为调用方的标识（行号、文件、号码本身等），默认用数字串本身。
+    add 之后第一次查询时才排序后缀表；边加边查时按批合并。
+    """
+
+    def __init__(self, min_len: int = DEFAULT_MIN_LEN):
+        self.min_len = min_len
+        self._items = {}      # 数字串 -> {条目}
+        self._lengths = []    # 已收录的、>= min_len 的数字串长度（升序）
+        self._suffixes = []   # [(后缀, 数字串)]，已排序
+        self._pending = []    # 新加入、尚未并入排序表的后缀
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, number, item=None) -> None:
+        digits = digits_only(number)
+        if not digits:
+            return
+        bucket = self._items.get(digits)
+        if bucket is None:
+            bucket = self._items[digits] = set()
+            if len(digits) >= self.min_len:
+                if len(digits) not in self._lengths:
+                    self._lengths.append(len(digits))
+                    self._lengths.sort()
+                # 查询串至少 min_len 位，更短的后缀不可能以它为前缀
+                self._pending.extend((digits[i:], digits) for i in range(len(digits) - self.min_len + 1))
+        bucket.add(digits if item is None else item)
+
+    def _sorted_suffixes(self) -> list:
+        if self._pending:
+            if len(self._pending) <= INSORT_LIMIT:
+                # 边加边查（如每登记一个流水加入它的号码）时新后缀很少，逐个插入，不必整表重排
+                for suffix in self._pending:
+                    insort(self._suffixes, suffix)
+            else:
+                self._suffixes = sorted(self._suffixes + self._pending)
+            self._pending = []
+        return self._suffixes
+
+    def _collect(self, numbers) -> set:
+        out = set()
+        for digits in numbers:
+            out |= self._items[digits]
+        return out
+
+    def exact(self, query) -> set:
+        return set(self._items.get(digits_only(query), ()))
+
+    def containing(self, query) -> set:
+        """数字序列包含查询串的条目（查询串须 >= min_len 位）。"""
+        digits = digits_only(query)
+        if len(digits) < self.min_len:
+            return set()
+        suffixes = self._sorted_suffixes()
+        lo = bisect_left(suffixes, (digits,))
+        hi = bisect_left(suffixes, (digits + _PREFIX_END,), lo)
+        return self._collect({owner for _, owner in suffixes[lo:hi]})
+
+    def contained_in(self, query) -> set:
+        """数字序列（>= min_len 位）是查询串子串的条目。"""
+        digits = digits_only(query)
+        found = set()
+        for length in self._lengths:
+            if length > len(digits):
+                break
+            for i in range(len(digits) - length + 1):
+                sub = digits[i:i + length]
+                if sub in self._items:
+                    found.add(sub)
+        return self._collect(found)
+
+    def match(self, query) -> set:
+        """与 digit_match(query, 号码) 为真的全部条目。"""
+        digits = digits_only(query)
+        if not digits:
+            return set()
+        return self.exact(digits) | self.containing(digits) | self.contained_in(digits)
@@ -0,0 +1,416 @@
+# coding: utf-8
+r"""
+流水入库
+- 把合并后的提取数据直接写入 MySQL 表（如 yongkun_gold.永坤资金池账户交易明细），省去 流水汇总 xlsx/csv 导出后再手工导入
+- 建表：按提取表的列名定类型，金额列 DECIMAL(20,2)，日期 DATETIME，账号/卡号类 VARCHAR(128)，户名类 VARCHAR(255)，其余 TEXT；
+  表已存在时只补上缺少的列；后续数据块出现新列时同样先补列再导入
+- 类型只看列名、不看某一块数据推断出的 dtype：写入前各列按列类型转换（如纯数字的 交易流水号 仍按文本写入）
+- 导入：数据按 chunk_rows 行切块写成临时 TSV（\N 表示 NULL），多个连接并行 LOAD DATA LOCAL INFILE；
+  服务器未开启 local_infile 时自动改用多行 INSERT
+- 完成后报告导入行数与每秒行数
+- 单独运行时把已有的 流水汇总_*.xlsx/csv 导入数据库，可用于对本地 MySQL/MariaDB 实例测试：
+    python 流水入库.py 流水汇总_1.csv 流水汇总_2.csv --mysql-db test --mysql-table 提取明细
+
+依赖：pandas；pymysql（仅导入 MySQL 时需要）
+"""
+
+import os
+import time
+import getpass
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, ALL_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pymysql
+except ImportError:
+    pymysql = None
+
+
+MYSQL_HOST = "localhost"
+MYSQL_PORT = 3306
+MYSQL_USER = "root"
+MYSQL_DB = "yongkun_gold"
+MYSQL_TABLE = "永坤资金池账户交易明细"
+CHUNK_ROWS = 100_000
+DEFAULT_LOADERS = 4
+INSERT_BATCH = 1000
+KEY_COLUMN = "索引号"
+AMOUNT_COLUMNS = {"收入", "支出", "净流", "余额", "公式余额", "公式校验"}
+DATE_COLUMN = "日期"
+
+# 字符串列的类型：账号/卡号类、户名类单独给长度，其余不定长文本用 TEXT（不占行长上限）
+SHORT_TEXT_COLUMNS = {"本账号", "本卡号", "对手账/卡号", "交易流水号", "IP地址", "MAC地址"}
+NAME_COLUMNS = {"索引号", "本账号名称", "对手户名", "对手开户行", "对手户名（透视专用）"}
+# LOAD DATA 本地文件被服务器或客户端禁用时的错误码
+LOCAL_INFILE_ERRORS = {1148, 2068, 3948}
+
+
+# =========================
+# 配置
+# =========================
+def add_mysql_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group("MySQL 导入")
+    group.add_argument("--mysql-host", default=MYSQL_HOST)
+    group.add_argument("--mysql-port", type=int, default=MYSQL_PORT)
+    group.add_argument("--mysql-user", default=MYSQL_USER)
+    group.add_argument("--mysql-password", help="不填时读取环境变量 JA_MYSQL_PASSWORD，仍为空则提示输入")
+    group.add_argument("--mysql-db", default=MYSQL_DB)
+    group.add_argument("--mysql-table", default=MYSQL_TABLE)
+    group.add_argument("--mysql-loaders", type=int, default=DEFAULT_LOADERS, help="并行导入连接数")
+    group.add_argument("--mysql-chunk-rows", type=int, default=CHUNK_ROWS, help="每个导入块的行数")
+
+
+def mysql_settings(args: argparse.Namespace) -> dict:
+    password = args.mysql_password
+    if password is None:
+        password = os.environ.get("JA_MYSQL_PASSWORD")
+    if password is None:
+        password = getpass.getpass(f"请输入 MySQL 用户 {args.mysql_user} 的密码：")
+    return {
+        "host": args.mysql_host,
+        "port": args.mysql_port,
+        "user": args.mysql_user,
+        "password": password,
+        "database": args.mysql_db,
+        "table": args.mysql_table,
+        "loaders": max(1, args.mysql_loaders),
+        "chunk_rows": max(1, args.mysql_chunk_rows),
+    }
+
+
+def connect(settings: dict, local_infile: bool = False):
+    if pymysql is None:
+        raise RuntimeError("导入 MySQL 需要安装 pymysql：pip install pymysql")
+    return pymysql.connect(
+        host=settings["host"], port=settings["port"],
+        user=settings["user"], password=settings["password"],
+        database=settings["database"], charset="utf8mb4",
+        local_infile=local_infile, autocommit=False,
+    )
+
+
+def quote_name(name: str) -> str:
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+# =========================
+# 建表
+# =========================
+def column_type(name: str) -> str:
+    """列类型按 提取 表的列名决定（与 提取表拼接 的类型转换规则一致）。"""
+    if name == DATE_COLUMN:
+        return "DATETIME"
+    if name in AMOUNT_COLUMNS:
+        return "DECIMAL(20,2)"
+    if name in SHORT_TEXT_COLUMNS:
+        return "VARCHAR(128)"
+    if name in NAME_COLUMNS:
+        return "VARCHAR(255)"
+    return "TEXT"
+
+
+def ensure_table(settings: dict, columns) -> None:
+    """表不存在时按 columns 建表（含 索引号 索引）；已存在时补上缺少的列。"""
+    table = quote_name(settings["table"])
+    columns = list(columns)
+    defs = [f"{quote_name(col)} {column_type(col)} NULL" for col in columns]
+    if KEY_COLUMN in columns:
+        defs.append(f"KEY {quote_name('idx_' + KEY_COLUMN)} ({quote_name(KEY_COLUMN)})")
+    conn = connect(settings)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(defs)}) "
+                        f"ENGINE=InnoDB DEFAULT CHARSET=utf8mb4")
+            cur.execute(f"SHOW COLUMNS FROM {table}")
+            existing = {row[0] for row in cur.fetchall()}
+            for col in columns:
+                if col not in existing:
+                    cur.execute(f"ALTER TABLE {table} ADD COLUMN {quote_name(col)} {column_type(col)} NULL")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def delete_keys(settings: dict, keys) -> int:
+    """删除表中这些索引号的旧行（重新导入前调用）；表不存在时什么也不做。返回删除的行数。"""
+    keys = sorted(keys)
+    if not keys:
+        return 0
+    conn = connect(settings)
+    deleted = 0
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SHOW TABLES LIKE %s", (settings["table"],))
+            if not cur.fetchone():
+                return 0
+            for i in range(0, len(keys), INSERT_BATCH):
+                batch = keys[i:i + INSERT_BATCH]
+                deleted += cur.execute(
+                    f"DELETE FROM {quote_name(settings['table'])} WHERE {quote_name(KEY_COLUMN)} IN "
+                    f"({', '.join(['%s'] * len(batch))})", batch)
+        conn.commit()
+    finally:
+        conn.close()
+    return deleted
+
+
+# =========================
+# 数据块转换
+# =========================
+def _text_value(v) -> str:
+    # 整数值的浮点数（如读成 float 的流水号）不带 .0
+    if isinstance(v, (float, np.floating)) and float(v).is_integer():
+        return str(int(v))
+    return str(v)
+
+
+def conform_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """各列按 column_type 转成对应类型：金额转数值（两位小数），日期转时间，其余转文本；无法识别的记为空。"""
+    out = {}
+    for col in df.columns:
+        series = df[col]
+        kind = column_type(col)
+        if kind == "DECIMAL(20,2)":
+            if not pd.api.types.is_numeric_dtype(series):
+                series = pd.to_numeric(series, errors="coerce")
+            series = series.astype(float).round(2)
+        elif kind == "DATETIME":
+            if not pd.api.types.is_datetime64_any_dtype(series):
+                series = pd.to_datetime(series, errors="coerce")
+        elif pd.api.types.infer_dtype(series, skipna=True) not in ("string", "empty"):
+            series = series.map(_text_value).where(series.notna(), None).astype(object)
+        out[col] = series
+    return pd.DataFrame(out, index=df.index)
+
+
+def _tsv_column(series: pd.Series) -> pd.Series:
+    """一列转成 LOAD DATA 默认格式的文本：反斜杠/制表符/换行转义，空值为 \\N。"""
+    missing = series.isna()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        text = series.dt.strftime("%Y-%m-%d %H:%M:%S")
+    elif pd.api.types.is_numeric_dtype(series):
+        text = series.map("{:.2f}".format)
+    else:
+        text = (series.astype(str)
+                .str.replace("\\", "\\\\", regex=False)
+                .str.replace("\t", "\\t", regex=False)
+                .str.replace("\n", "\\n", regex=False)
+                .str.replace("\r", "\\r", regex=False))
+    return text.where(~missing, "\\N").astype(object)
+
+
+def write_tsv(df: pd.DataFrame, path: str) -> None:
+    columns = [_tsv_column(df[col]) for col in df.columns]
+    lines = columns[0].str.cat(columns[1:], sep="\t") if len(columns) > 1 else columns[0]
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write("\n".join(lines.tolist()))
+        f.write("\n")
+
+
+def _insert_rows(df: pd.DataFrame) -> list:
+    """INSERT 回退用：空值转 None，时间转 datetime，金额保留两位小数。"""
+    columns = []
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = [None if pd.isna(v) else v.to_pydatetime() for v in series]
+        elif pd.api.types.is_numeric_dtype(series):
+            values = series.round(2).astype(object).where(np.isfinite(series.astype(float)), None).tolist()
+        else:
+            values = series.astype(object).where(series.notna(), None).tolist()
+        columns.append(values)
+    return list(zip(*columns))
+
+
+# =========================
+# 并行导入
+# =========================
+class MySQLLoader:
+    """
+    并行导入器：put() 累积到 chunk_rows 行后切块交给加载线程，close() 等待全部完成并报告行数/速度。
+    每个加载线程使用自己的连接；同时在途的块数限制为连接数的 2 倍，内存占用有上限。
+    """
+
+    def __init__(self, settings: dict):
+        self.settings = settings
+        self.table = quote_name(settings["table"])
+        self.tmp_dir = tempfile.mkdtemp(prefix="流水入库_")
+        self.pool = ThreadPoolExecutor(max_workers=settings["loaders"])
+        self.pending = set()
+        self.buffer = []
+        self.buffered_rows = 0
+        self.columns = None
+        self.use_insert = False
+        self.rows = 0
+        self.chunks = 0
+        self.started = time.time()
+        self._local = threading.local()
+        self._conns = []
+        self._lock = threading.Lock()
+
+    # ---- 连接 ----
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.settings, local_infile=not self.use_insert)
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def _prepare(self, df: pd.DataFrame) -> None:
+        """首块数据到来时建表，并确认服务器是否允许 LOAD DATA LOCAL。"""
+        ensure_table(self.settings, df.columns)
+        self.columns = set(df.columns)
+        conn = connect(self.settings)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT @@local_infile")
+                self.use_insert = not int(cur.fetchone()[0])
+        finally:
+            conn.close()
+        if self.use_insert:
+            print("MySQL 服务器未开启 local_infile，改用多行 INSERT 导入（较慢）。")
+
+    # ---- 单块导入（在加载线程中执行）----
+    def _load_chunk(self, df: pd.DataFrame, path: str) -> int:
+        df = conform_frame(df)
+        cols = ", ".join(quote_name(c) for c in df.columns)
+        conn = self._conn()
+        try:
+            if not self.use_insert:
+                try:
+                    write_tsv(df, path)
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            f"LOAD DATA LOCAL INFILE %s INTO TABLE {self.table} CHARACTER SET utf8mb4 "
+                            f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({cols})",
+                            (path,))
+                    conn.commit()
+                    return len(df)
+                except pymysql.err.OperationalError as e:
+                    if e.args[0] not in LOCAL_INFILE_ERRORS:
+                        raise
+                    conn.rollback()
+                    with self._lock:
+                        if not self.use_insert:
+                            self.use_insert = True
+                            print(f"LOAD DATA LOCAL 被拒绝（{e.args[0]}），改用多行 INSERT 导入。")
+                finally:
+                    if os.path.exists(path):
+                        os.remove(path)
+            rows = _insert_rows(df)
+            sql = f"INSERT INTO {self.table} ({cols}) VALUES ({', '.join(['%s'] * len(df.columns))})"
+            with conn.cursor() as cur:
+                for i in range(0, len(rows), INSERT_BATCH):
+                    cur.executemany(sql, rows[i:i + INSERT_BATCH])  # pymysql 会合并为多行 INSERT
+            conn.commit()
+            return len(df)
+        except Exception:
+            conn.rollback()
+            raise
+
+    # ---- 对外接口 ----
+    def put(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        if self.columns is None:
+            self._prepare(df)
+        new_columns = [c for c in df.columns if c not in self.columns]
+        if new_columns:
+            # 后续数据块多出的列先补到表上：补列在主线程完成，之后才会有含这些列的块交给加载线程
+            ensure_table(self.settings, new_columns)
+            self.columns.update(new_columns)
+        self.buffer.append(df)
+        self.buffered_rows += len(df)
+        if self.buffered_rows >= self.settings["chunk_rows"]:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self.buffer:
+            return
+        chunk = pd.concat(self.buffer, ignore_index=True) if len(self.buffer) > 1 else self.buffer[0]
+        self.buffer, self.buffered_rows = [], 0
+        step = self.settings["chunk_rows"]
+        for start in range(0, len(chunk), step):
+            while len(self.pending) >= self.settings["loaders"] * 2:
+                self._collect(FIRST_COMPLETED)
+            path = os.path.join(self.tmp_dir, f"{self.chunks}.tsv")
+            self.chunks += 1
+            self.pending.add(self.pool.submit(self._load_chunk, chunk.iloc[start:start + step], path))
+
+    def _collect(self, return_when) -> None:
+        done, self.pending = wait(self.pending, return_when=return_when)
+        for fut in done:
+            self.rows += fut.result()  # 加载线程的异常在这里重新抛出
+
+    def close(self) -> tuple[int, float]:
+        """导入剩余数据并等待完成，返回 (导入行数, 用时秒)。"""
+        try:
+            self._flush()
+            self._collect(ALL_COMPLETED)
+        finally:
+            self.pool.shutdown(wait=True)
+            for conn in self._conns:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            for name in os.listdir(self.tmp_dir):
+                os.remove(os.path.join(self.tmp_dir, name))
+            os.rmdir(self.tmp_dir)
+        return self.rows, time.time() - self.started
+
+
+def report(rows: int, seconds: float, settings: dict) -> None:
+    speed = rows / seconds if seconds > 0 else 0
+    print(f"已导入 {rows} 行到 {settings['database']}.{settings['table']}，"
+          f"用时 {seconds:.1f} 秒，约 {speed:,.0f} 行/秒")
+
+
+# =========================
+# 单独运行：导入已有的流水汇总文件
+# =========================
+def read_summary_file(path: str, usecols=None) -> pd.DataFrame:
+    """读取 提取表拼接 输出的 流水汇总 文件，恢复金额/日期列类型，其余列按文本读入。"""
+    if path.lower().endswith(".csv"):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8-sig", usecols=usecols)
+    else:
+        df = pd.read_excel(path, dtype=str, keep_default_na=False, usecols=usecols)
+    for col in df.columns:
+        if col in AMOUNT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").round(2)
+        elif col == DATE_COLUMN:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把 流水汇总 xlsx/csv 文件导入 MySQL")
+    parser.add_argument("files", nargs="+", help="流水汇总 文件")
+    parser.add_argument("--replace", action="store_true", help="导入前删除表中这些文件涉及的索引号")
+    add_mysql_arguments(parser)
+    args = parser.parse_args()
+    settings = mysql_settings(args)
+
+    if args.replace:
+        # 同一索引号可能拆在多个 _partN 文件里，先收集全部索引号再统一删除
+        keys = set()
+        for path in args.files:
+            keys.update(read_summary_file(path, usecols=[KEY_COLUMN])[KEY_COLUMN])
+        print(f"删除已有行：{delete_keys(settings, keys)} 行")
+    loader = MySQLLoader(settings)
+    for path in args.files:
+        df = read_summary_file(path)
+        loader.put(df)
+        print(f"已读取：{path}（{len(df)} 行）")
+    report(*loader.close(), settings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# coding: utf-8
+r"""
+流水数据集
+- 合并后的提取数据按 Hive 分区写成 Parquet 数据集：<根目录>/索引号=<索引号>/[年份=<年份>/]part-0.parquet
+- 本账号/本卡号/户名/开户行等重复值多的列用字典编码，zstd 压缩，体积远小于同样数据的 xlsx
+- 读取接口按账号、对手、日期区间、索引号过滤：分区目录先裁剪，行组再按统计信息跳过，只读需要的列和行组
+- 每个索引号一个分区目录，增量合并时只需整体替换受影响的分区
+
+用法示例：
+    from 流水数据集 import read_flows
+    df = read_flows(r"D:\案件\流水数据集", accounts=["6222021234567890"], start="2021-01-01", end="2021-12-31")
+
+命令行：
+    python 流水数据集.py D:\案件\流水数据集 --account 6222021234567890 --start 2021-01-01 --out 结果.csv
+
+依赖：pandas、pyarrow
+"""
+
+import os
+import uuid
+import shutil
+import argparse
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+KEY_COLUMN = "索引号"
+YEAR_COLUMN = "年份"
+DATE_COLUMN = "日期"
+ACCOUNT_COLUMNS = ["本账号", "本卡号"]
+COUNTERPARTY_COLUMNS = ["对手户名", "对手账/卡号"]
+DICTIONARY_COLUMNS = ["本账号名称", "本账号", "本卡号", "对手户名", "对手开户行", "对手账/卡号"]
+COMPRESSION = "zstd"
+ROW_GROUP_SIZE = 64 * 1024
+FILE_NAME = "part-0.parquet"
+# 分区目录名中需要转义的字符（Windows 文件名非法字符及分区语法字符），读取时 pyarrow 按 URI 编码还原
+_UNSAFE_CHARS = set('/\\:*?"<>|%=') | {chr(i) for i in range(32)}
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError("Parquet 数据集需要安装 pyarrow：pip install pyarrow")
+
+
+def partition_dir_name(column: str, value) -> str:
+    text = "".join(f"%{ord(c):02X}" if c in _UNSAFE_CHARS else c for c in str(value))
+    return f"{column}={text}"
+
+
+# =========================
+# 写出
+# =========================
+def _to_arrow(df: pd.DataFrame) -> "pa.Table":
+    """统一列类型：日期为时间戳，数值列为 float64，其余列一律为字符串，保证各分区 schema 可合并。"""
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if col == KEY_COLUMN:
+            continue
+        if pd.api.types.is_datetime64_any_dtype(series):
+            columns[col] = pa.array(series.astype("datetime64[us]"), type=pa.timestamp("us"))
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            columns[col] = pa.array(series.astype(float), type=pa.float64())
+        else:
+            values = series.astype(object).where(series.notna(), None)
+            columns[col] = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+    return pa.table(columns)
+
+
+def write_partition(root: str, key: str, df: pd.DataFrame, by_year: bool = False) -> int:
+    """
+    整体替换一个索引号的分区：先写到临时目录，再删除旧分区并改名，中途失败不会留下半个分区。
+    by_year=True 时在索引号下再按 日期 的年份分区（日期为空的行放在默认分区）。返回写出的行数。
+    """
+    _require_pyarrow()
+    os.makedirs(root, exist_ok=True)
+    final = os.path.join(root, partition_dir_name(KEY_COLUMN, key))
+    staging = os.path.join(root, f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(staging)
+    try:
+        if by_year and DATE_COLUMN in df.columns:
+            years = pd.to_datetime(df[DATE_COLUMN], errors="coerce").dt.year
+            for year, part in df.groupby(years.fillna(-1).astype(int), sort=True):
+                label = "__HIVE_DEFAULT_PARTITION__" if year == -1 else str(year)
+                target = os.path.join(staging, f"{YEAR_COLUMN}={label}")
+                os.makedirs(target)
+                pq.write_table(_to_arrow(part), os.path.join(target, FILE_NAME), compression=COMPRESSION,
+                               use_dictionary=DICTIONARY_COLUMNS, row_group_size=ROW_GROUP_SIZE)
+        else:
+            pq.write_table(_to_arrow(df), os.path.join(staging, FILE_NAME), compression=COMPRESSION,
+                           use_dictionary=DICTIONARY_COLUMNS, row_group_size=ROW_GROUP_SIZE)
+        remove_partition(root, key)
+        os.replace(staging, final)
+    finally:
+        if os.path.exists(staging):
+            shutil.rmtree(staging, ignore_errors=True)
+    return len(df)
+
+
+def remove_partition(root: str, key: str) -> bool:
+    path = os.path.join(root, partition_dir_name(KEY_COLUMN, key))
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+        return True
+    return False
+
+
+# =========================
+# 读取
+# =========================
+def open_dataset(root: str) -> "pds.Dataset":
+    """打开数据集；各分区的列可能不完全一致，按所有文件的 schema 合并（缺列读出为空）。"""
+    _require_pyarrow()
+    # 分区字段类型显式指定：纯数字的索引号也按字符串处理
+    fields = [(KEY_COLUMN, pa.string())]
+    if _has_year_partitions(root):
+        fields.append((YEAR_COLUMN, pa.int32()))
+    partitioning = pds.partitioning(pa.schema(fields), flavor="hive")
+    dataset = pds.dataset(root, format="parquet", partitioning=partitioning, ignore_prefixes=[".", "_"])
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+    if not schemas:
+        return dataset
+    schema = pa.unify_schemas(schemas + [partitioning.schema])
+    return pds.dataset(root, format="parquet", partitioning=partitioning, schema=schema,
+                       ignore_prefixes=[".", "_"])
+
+
+def _has_year_partitions(root: str) -> bool:
+    """看第一个索引号分区下是否还有 年份= 子目录。"""
+    for entry in os.scandir(root):
+        if entry.is_dir() and entry.name.startswith(KEY_COLUMN + "="):
+            return any(sub.name.startswith(YEAR_COLUMN + "=") for sub in os.scandir(entry.path))
+    return False
+
+
+def build_filter(dataset: "pds.Dataset", accounts=None, counterparties=None, start=None, end=None,
+                 index_keys=None):
+    """按条件生成过滤表达式；账号匹配 本账号/本卡号，对手匹配 对手户名/对手账/卡号，日期区间两端都包含。"""
+    names = set(dataset.schema.names)
+    conditions = []
+
+    def any_of(columns, values):
+        values = [str(v) for v in values]
+        exprs = [pds.field(col).isin(values) for col in columns if col in names]
+        if not exprs:
+            return pds.scalar(False)
+        expr = exprs[0]
+        for e in exprs[1:]:
+            expr = expr | e
+        return expr
+
+    if index_keys:
+        conditions.append(pds.field(KEY_COLUMN).isin([str(k) for k in index_keys]))
+    if accounts:
+        conditions.append(any_of(ACCOUNT_COLUMNS, accounts))
+    if counterparties:
+        conditions.append(any_of(COUNTERPARTY_COLUMNS, counterparties))
+    if start is not None or end is not None:
+        start = pd.Timestamp(start) if start is not None else None
+        # 只给日期（无时分秒）的结束日期包含当天全天
+        end = pd.Timestamp(end) if end is not None else None
+        if end is not None and end == end.normalize():
+            end = end + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+        if start is not None:
+            conditions.append(pds.field(DATE_COLUMN) >= pa.scalar(start.to_pydatetime(), pa.timestamp("us")))
+        if end is not None:
+            conditions.append(pds.field(DATE_COLUMN) <= pa.scalar(end.to_pydatetime(), pa.timestamp("us")))
+        if YEAR_COLUMN in names:
+            # 按年份分区时先裁剪目录；默认分区（年份为空）不可能落在区间内
+            if start is not None:
+                conditions.append(pds.field(YEAR_COLUMN) >= start.year)
+            if end is not None:
+                conditions.append(pds.field(YEAR_COLUMN) <= end.year)
+    if not conditions:
+        return None
+    expr = conditions[0]
+    for c in conditions[1:]:
+        expr = expr & c
+    return expr
+
+
+def read_flows(root: str, accounts=None, counterparties=None, start=None, end=None, index_keys=None,
+               columns=None) -> pd.DataFrame:
+    """
+    按条件读取流水：分区（索引号/年份）先按目录裁剪，其余条件下推到 Parquet 行组统计信息，
+    只读取 columns 指定的列（默认全部）。返回 DataFrame，列顺序与写入时一致，索引号放在第一列。
+    """
+    dataset = open_dataset(root)
+    expr = build_filter(dataset, accounts, counterparties, start, end, index_keys)
+    if columns is None:
+        columns = [KEY_COLUMN] + [n for n in dataset.schema.names if n not in (KEY_COLUMN, YEAR_COLUMN)]
+    table = dataset.to_table(columns=columns, filter=expr)
+    return table.to_pandas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按条件查询 Parquet 流水数据集")
+    parser.add_argument("root", help="数据集根目录")
+    parser.add_argument("--account", action="append", help="本账号/本卡号，可多次指定")
+    parser.add_argument("--counterparty", action="append", help="对手户名/对手账卡号，可多次指定")
+    parser.add_argument("--index", action="append", help="索引号，可多次指定")
+    parser.add_argument("--start", help="开始日期，如 2021-01-01")
+    parser.add_argument("--end", help="结束日期（含当天）")
+    parser.add_argument("--out", help="结果另存为 csv/xlsx")
+    args = parser.parse_args()
+
+    df = read_flows(args.root, args.account, args.counterparty, args.start, args.end, args.index)
+    print(f"共 {len(df)} 行")
+    if args.out:
+        if args.out.lower().endswith(".csv"):
+            df.to_csv(args.out, index=False, encoding="utf-8-sig")
+        else:
+            df.to_excel(args.out, index=False)
+        print(f"已保存：{args.out}")
+    else:
+        print(df.head(20).to_string())
+
+
+if __name__ == "__main__":
+    main()
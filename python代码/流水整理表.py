@@ -0,0 +1,68 @@
+# coding: utf-8
+r"""
+流水整理表
+- 两个 银行流水整理 脚本共用的整列转换：交易时间拆分、金额转换、由银行交易明细构造银行流水整理表的行
+- 规则与原逐行写法一致，放在一处，两个脚本的结果不会各自走样
+
+依赖：pandas
+"""
+
+import pandas as pd
+
+
+def split_date_time(datetime_series):
+    """整列拆分“日期 时间”；恰好两段才拆，否则（含空值）日期、时间均为空串。"""
+    parts = datetime_series.str.split()
+    ok = parts.str.len() == 2
+    return parts.str[0].where(ok, ''), parts.str[1].where(ok, '')
+
+
+def amounts_to_float(amounts):
+    """逐个按 float() 语义转换（与原逐行写法一致），空值为 NaN。"""
+    return amounts.to_numpy(dtype=object).astype(float)
+
+
+def build_arranged_rows(transaction_df, account_names, columns):
+    """整列构造银行流水整理表：收付标志 -> 流入/流出/净流，所有“摘要*”列合并为摘要说明。"""
+    amounts = transaction_df['交易金额']
+    flags = transaction_df['收付标志']
+    is_in = flags == '进'
+    is_out = flags == '出'
+    # 与逐行写法一致：金额为空串时净流留空，金额缺失（NaN）时净流为 NaN
+    has_amount = ~(amounts == '')
+    net_flow = pd.Series('', index=amounts.index, dtype=object)
+    net_flow[is_in & has_amount] = amounts_to_float(amounts[is_in & has_amount])
+    net_flow[is_out & has_amount] = -amounts_to_float(amounts[is_out & has_amount])
+
+    summary_cols = [col for col in transaction_df.columns if '摘要' in col]
+    if summary_cols:
+        summary = transaction_df[summary_cols[0]].astype(object).fillna('nan').astype(str)
+        for col in summary_cols[1:]:
+            summary = summary + ' ' + transaction_df[col].astype(object).fillna('nan').astype(str)
+    else:
+        summary = ''
+
+    new_rows_df = pd.DataFrame({
+        "账户名": account_names,
+        "交易卡号": transaction_df['交易卡号'],
+        "交易账号": transaction_df['交易账号'],
+        "交易日期": transaction_df['交易日期'],
+        "交易时间": transaction_df['交易时间'],
+        "交易金额": amounts,
+        "流入": amounts.where(is_in, ''),
+        "流出": amounts.where(is_out, ''),
+        "净流": net_flow,
+        "余额": transaction_df['交易余额'],
+        "公式余额": '',
+        "公式校验": '',
+        "收付标志": flags,
+        "交易对手账卡号": transaction_df['交易对手账卡号'],
+        "对手户名": transaction_df['对手户名'],
+        "对手开户银行": transaction_df['对手开户银行'],
+        "摘要说明": summary,
+        "交易币种": transaction_df['交易币种'],
+        "备注": '',
+        "查询反馈结果原因": '',
+        "选取": ''
+    }, index=transaction_df.index, columns=columns)
+    return new_rows_df.dropna(how='all')
@@ -4,9 +4,16 @@ r"""
 - 从统计表和流水文件夹生成《登记信息.xlsx》，并将文件按规则归档：
   1已登记 / 2被跳过 / 3重复账号
 - 账户信息工作表筛选：选择含“账户信息”并排除含“关联子账户信息”的表
-- 并发安全：查→分→写映射 在同一把锁内（原子），搬运放锁外
-- 线程数：基于CPU与文件数自动决定，最大不超过 61（Fuck Microsoft）
+- 三段流水线：进程池解析流水为精简摘要 → 主线程按文件顺序查/分序号（结果确定，不需要锁）→ 单线程搬运重命名
+- 进程数：基于CPU与文件数自动决定，最大不超过 61（Fuck Microsoft）；--executor thread 退回线程池
 - .xls 兼容：需要 xlrd==1.2.0；否则提示转 .xlsx
+- 断点续跑：每个序号决定与搬运结果先 fsync 写入 登记日志.jsonl，中断后加 --resume 沿用已分配序号、只处理剩余文件；
+  登记信息写出成功后删除日志
+- 运行统计：逐文件记录各阶段耗时（读取/匹配/余额差异/排队等待/搬运）与文件大小，
+  分位数与最慢 20 个文件（按文件自身各阶段耗时排名，排队等待单列）写入 run_log.txt，完整数据写入 run_report.json
+- --fuzzy-min-len N：查重复账号时，完全相同的号码查不到再按数字子串（较短者至少 N 位）匹配统计表中的账号/卡号；
+  统计表号码的数字匹配索引每次运行只建一次
+- 每个流水工作簿只打开一次：提取/整理表/账户信息* 共用一个 WorkbookSession，只解析用到的列
 
 依赖：pandas, openpyxl（必要），xlrd==1.2.0（若需读取 .xls）
 """
@@ -14,14 +21,20 @@ r"""
 import os
 import re
 import sys
+import json
 import shutil
 import logging
 import warnings
+import argparse
+import functools
+import traceback
+import multiprocessing
 from pathlib import Path
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 import threading
 import time
+import heapq
 
 warnings.filterwarnings(
     "ignore",
@@ -33,6 +46,12 @@ import pandas as pd
 from openpyxl import load_workbook, Workbook
 import numpy as np
 
+from 解析缓存 import WorkbookSession, add_cache_arguments, configure_from_args
+from 数字匹配索引 import DigitIndex
+from 余额核对 import typed_columns, reconcile_balances
+from 并行读取 import add_parallel_arguments, iter_parallel
+from 并行写出 import decide_worker_count
+
 
 # =========================
 # 常量
@@ -40,14 +59,30 @@ import numpy as np
 HEADER_ROW = 5
 STATISTICS_SHEET = '统计表'
 OUTPUT_FILE_NAME = '登记信息.xlsx'
+JOURNAL_FILE_NAME = '登记日志.jsonl'
+REPORT_FILE_NAME = 'run_report.json'
+REPORT_PERCENTILES = (50, 90, 99)
+SLOWEST_FILES = 20
+ERROR_NOTE = '处理异常'
+QUEUE_STAGE = '排队等待'
 SUBDIR_REGISTERED = '1已登记'
 SUBDIR_SKIPPED = '2被跳过'
 SUBDIR_DUPLICATE = '3重复账号'
 WIN_THREAD_CAP = 61
+OUTPUT_HEADERS = [
+    '文件名', '已取序号', '是否整理', '币种', '账户名', '开户行',
+    '账号', '卡号', '是否取得', '取得时间', '*详细说明',
+    '*是否需重取', '⑤编制人', '已取得交易期间'
+]
 
 ALLOW_RE = re.compile(r'^\s*账户信息(\d+)?\s*$')
 DENY_RE  = re.compile(r'关联子账户信息')
 
+# 各表实际用到的列（只解析这些列）
+TIQU_COLUMNS = {'本账号名称', '本账号', '本卡号', '公式校验', '日期'}
+ZHENGLI_COLUMNS = {'交易币种'}
+ACCOUNT_INFO_COLUMNS = {'交易账号', '交易卡号', '账号开户银行', '开户网点', '账号开户时间', '销户日期'}
+
 SAFE_NAME_RE = re.compile(r'[<>:"/\\|?*\x00-\x1F]')  # Windows 不允许的字符
 
 
@@ -177,20 +212,12 @@ def decide_thread_count(num_files: int) -> int:
 # =========================
 # Excel 读取工具
 # =========================
-def pick_account_info_sheetnames(path: Path) -> list[str]:
+def pick_account_info_sheetnames(book: WorkbookSession) -> list[str]:
     """列出所有允许的“账户信息*”sheet（排除“关联子账户信息*”）。"""
-    # 用 pandas.ExcelFile 拿 sheet_names（支持 xlsx/xls）
-    engine = None
-    suf = path.suffix.lower()
-    if suf in ('.xlsx', '.xlsm'):
-        engine = 'openpyxl'
-    elif suf == '.xls':
-        engine = 'xlrd'  # 需要 xlrd==1.2.0
     try:
-        with pd.ExcelFile(path, engine=engine) as xf:
-            names = xf.sheet_names
+        names = book.sheet_names()
     except Exception as e:
-        raise RuntimeError(f'无法读取工作簿以获取工作表列表：{path.name}。若为 .xls，请安装 xlrd==1.2.0 或转换为 .xlsx') from e
+        raise RuntimeError(f'无法读取工作簿以获取工作表列表：{book.path.name}。若为 .xls，请安装 xlrd==1.2.0 或转换为 .xlsx') from e
 
     # 排除关联子账户信息；允许严格 ^账户信息(\d+)?$
     out = []
@@ -202,41 +229,50 @@ def pick_account_info_sheetnames(path: Path) -> list[str]:
     return out
 
 
-def read_excel_safe(path: Path, sheet_name, dtype=str) -> pd.DataFrame:
-    """按扩展名选择引擎读取 Excel；.xls 需要 xlrd==1.2.0。"""
-    suf = path.suffix.lower()
-    engine = None
-    if suf in ('.xlsx', '.xlsm'):
-        engine = 'openpyxl'
-    elif suf == '.xls':
-        engine = 'xlrd'
-    return pd.read_excel(path, sheet_name=sheet_name, dtype=dtype, engine=engine)
-
-
-def read_account_info_df(path: Path, logger: logging.Logger) -> pd.DataFrame:
+def read_account_info_df(book: WorkbookSession, logger: logging.Logger) -> pd.DataFrame:
     """读取并合并所有有效的 '账户信息*' 表；若无则返回空表。"""
-    sheets = pick_account_info_sheetnames(path)
+    sheets = pick_account_info_sheetnames(book)
     if not sheets:
         return pd.DataFrame()
     dfs = []
     for sn in sheets:
         try:
-            df = read_excel_safe(path, sn, dtype=str)
+            df = book.parse(sn, usecols=ACCOUNT_INFO_COLUMNS)
             if isinstance(df, pd.DataFrame) and not df.empty:
                 dfs.append(df)
         except Exception:
-            logger.warning("读取账户信息工作表失败: %s | %s", sn, path.name)
+            logger.warning("读取账户信息工作表失败: %s | %s", sn, book.path.name)
             continue
     if not dfs:
         return pd.DataFrame()
     # 统一去掉末尾 .0、清理空白
     df = pd.concat(dfs, ignore_index=True)
-    for col in ('交易账号', '交易卡号', '账号开户银行', '开户网点', '账号开户时间', '销户日期'):
+    for col in ACCOUNT_INFO_COLUMNS:
         if col in df.columns:
             df[col] = df[col].map(normalize_number)
     return df
 
 
+def read_statement(path: Path, logger: logging.Logger, timer: 'StageTimer | None' = None):
+    """
+    打开一次工作簿，读出 提取、整理表（可选，只为币种）、账户信息*，返回后文件已关闭、可以移动。
+    提取 读取失败时抛出异常。
+    """
+    timer = timer or StageTimer()
+    with WorkbookSession(path) as book:
+        tiqu = book.parse('提取', usecols=TIQU_COLUMNS)
+        timer.lap('读取提取')
+        try:
+            zhengli = book.parse('整理表', usecols=ZHENGLI_COLUMNS)
+        except Exception:
+            logger.warning("整理表读取失败：%s", path.name)
+            zhengli = pd.DataFrame()
+        timer.lap('读取整理表')
+        account_info = read_account_info_df(book, logger)
+    timer.lap('读取账户信息')
+    return tiqu, zhengli, account_info
+
+
 def read_unique_values(df: pd.DataFrame, column: str) -> list[str]:
     """取指定列的去重非空字符串值，安全移除末尾 '.0'。"""
     if column not in df.columns:
@@ -250,12 +286,24 @@ def read_unique_values(df: pd.DataFrame, column: str) -> list[str]:
 # =========================
 # 统计表读取
 # =========================
-def read_statistics_info(path: Path, logger: logging.Logger):
-    """读取统计表中的已用序号、账号->序号、卡号->序号映射。"""
-    wb = load_workbook(path, data_only=True)
-    sheet = wb[STATISTICS_SHEET] if STATISTICS_SHEET in wb.sheetnames else wb.active
+def read_statistics_info(path: Path, logger: logging.Logger, extra_used=()):
+    """
+    读取统计表中的已用序号（SerialAllocator）、账号->序号、卡号->序号映射。
+    extra_used：另外视为已用的序号（续跑时为登记日志中已分配的序号）。
+    """
+    # 只读模式逐行扫描，不加载样式；表头按名称定位列
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = wb[STATISTICS_SHEET] if STATISTICS_SHEET in wb.sheetnames else wb.active
+        sheet.reset_dimensions()  # 只读模式默认信任 <dimension> 标记，标记过期时会漏掉已用序号
+        return _scan_statistics(sheet, logger, extra_used)
+    finally:
+        wb.close()
+
 
-    headers = [str(cell.value).strip() if cell.value else '' for cell in sheet[HEADER_ROW]]
+def _scan_statistics(sheet, logger: logging.Logger, extra_used=()):
+    header_row = next(sheet.iter_rows(min_row=HEADER_ROW, max_row=HEADER_ROW, values_only=True), ())
+    headers = [str(v).strip() if v else '' for v in header_row]
     header_map = {}
     for idx, h in enumerate(headers, start=1):
         header_map[h] = idx
@@ -264,14 +312,18 @@ def read_statistics_info(path: Path, logger: logging.Logger):
     def col(name: str):
         return header_map.get(name)
 
+    def value(row, name: str):
+        # 只读模式下行尾的空单元格可能不返回
+        idx = col(name)
+        return row[idx - 1] if idx and idx <= len(row) else None
+
     used_serials = set()
     account_serial = {}
     card_serial = {}
 
-    for row in sheet.iter_rows(min_row=HEADER_ROW + 1):
+    for row in sheet.iter_rows(min_row=HEADER_ROW + 1, values_only=True):
         # 序号
-        serial_cell = row[col('已取序号手动添加') - 1] if col('已取序号手动添加') else None
-        serial_value = serial_cell.value if serial_cell else None
+        serial_value = value(row, '已取序号手动添加')
         serial = None
         if serial_value is not None:
             try:
@@ -282,10 +334,8 @@ def read_statistics_info(path: Path, logger: logging.Logger):
                 pass
 
         # 账号/卡号
-        acc_val = row[col('账号') - 1].value if col('账号') else None
-        card_val = row[col('卡号') - 1].value if col('卡号') else None
-        acc_str = normalize_number(acc_val)
-        card_str = normalize_number(card_val)
+        acc_str = normalize_number(value(row, '账号'))
+        card_str = normalize_number(value(row, '卡号'))
 
         if serial is not None:
             if acc_str:
@@ -295,24 +345,61 @@ def read_statistics_info(path: Path, logger: logging.Logger):
 
     logger.info("统计表载入完成：已用序号 %d 个，账号映射 %d 条，卡号映射 %d 条",
                 len(used_serials), len(account_serial), len(card_serial))
-    return used_serials, account_serial, card_serial
+    return SerialAllocator(used_serials.union(extra_used)), account_serial, card_serial
 
 
 # =========================
-# 序号与映射（注意：外层统一持锁）
+# 序号与映射（只由协调线程按文件顺序调用）
 # =========================
-def next_serial(used: set[int]) -> int:
-    """分配下一个可用正整数序号（找最小可用）。"""
-    i = 1
-    while i in used:
-        i += 1
-    used.add(i)
-    return i
+class SerialAllocator:
+    """
+    分配最小可用正整数序号。已用序号之间的空号段 (起, 止) 放在最小堆里，没有空号时从最大已用序号往上分配；
+    每次分配 O(log n)，结果与从 1 开始逐个试探相同。
+    """
+
+    def __init__(self, used=()):
+        used = sorted(set(i for i in used if i > 0))
+        self._gaps = []
+        prev = 0
+        for i in used:
+            if i > prev + 1:
+                self._gaps.append((prev + 1, i - 1))
+            prev = i
+        heapq.heapify(self._gaps)
+        self._next = prev + 1  # 高水位：此后的序号都未使用
+        self._count = len(used)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def allocate(self) -> int:
+        if self._gaps:
+            start, end = heapq.heappop(self._gaps)
+            if start < end:
+                heapq.heappush(self._gaps, (start + 1, end))
+            serial = start
+        else:
+            serial = self._next
+            self._next += 1
+        self._count += 1
+        return serial
+
+
+def build_serial_index(account_map: dict, card_map: dict, min_len: int) -> DigitIndex:
+    """统计表（续跑时含日志中已分配）的账号/卡号 -> 序号 的数字匹配索引，每次运行只建一次，之后随分配增量加入。"""
+    index = DigitIndex(min_len)
+    for mapping in (account_map, card_map):
+        for number, serial in mapping.items():
+            index.add(number, serial)
+    return index
 
 
 def find_existing_serial(account: str | None, cards: list[str],
-                         account_map: dict, card_map: dict) -> int | None:
-    """在映射表中查找已存在的序号（account 或任何 card）。"""
+                         account_map: dict, card_map: dict, fuzzy: DigitIndex | None = None) -> int | None:
+    """
+    在映射表中查找已存在的序号（account 或任何 card）。
+    完全相同的号码都没有时，若给了 fuzzy 索引再按数字匹配查找，多个命中取最小的序号。
+    """
     if account:
         serial = account_map.get(account) or card_map.get(account)
         if serial is not None:
@@ -321,6 +408,11 @@ def find_existing_serial(account: str | None, cards: list[str],
         serial = card_map.get(c) or account_map.get(c)
         if serial is not None:
             return serial
+    if fuzzy is not None:
+        for number in ([account] if account else []) + list(cards):
+            found = fuzzy.match(number)
+            if found:
+                return min(found)
     return None
 
 
@@ -332,17 +424,36 @@ def ensure_dirs(base: Path):
         (base / name).mkdir(parents=True, exist_ok=True)
 
 
-def create_output_book(path: Path) -> Workbook:
-    if path.exists():
-        return load_workbook(path)
-    wb = Workbook()
-    ws = wb.active
-    ws.append([
-        '文件名', '已取序号', '是否整理', '币种', '账户名', '开户行',
-        '账号', '卡号', '是否取得', '取得时间', '*详细说明',
-        '*是否需重取', '⑤编制人', '已取得交易期间'
-    ])
-    return wb
+def read_output_rows(path: Path) -> tuple[list[tuple[str, list[list]]], int]:
+    """
+    读出已有《登记信息.xlsx》各工作表的内容（只读模式，公式按原文保留），返回 ([(表名, 行)], 活动表下标)；
+    文件不存在时返回只有表头的新表。
+    """
+    if not path.exists():
+        return [('Sheet', [OUTPUT_HEADERS])], 0
+    wb = load_workbook(path, read_only=True)
+    try:
+        sheets = []
+        for ws in wb.worksheets:
+            ws.reset_dimensions()  # 标记过期时只读模式会少读行，重写时这些登记行就丢了
+            sheets.append((ws.title, [list(r) for r in ws.iter_rows(values_only=True)]))
+        active = wb.worksheets.index(wb.active) if wb.active in wb.worksheets else 0
+    finally:
+        wb.close()
+    return sheets, active
+
+
+def save_output_book(path: Path, sheets: list[tuple[str, list[list]]], active: int = 0) -> None:
+    """write_only 模式写出全部行，先写临时文件再原子替换。"""
+    wb = Workbook(write_only=True)
+    for title, rows in sheets:
+        ws = wb.create_sheet(title)
+        for row in rows:
+            ws.append(row)
+    wb.active = active
+    tmp_path = path.with_suffix('.tmp.xlsx')
+    wb.save(tmp_path)
+    os.replace(tmp_path, path)
 
 
 def rename_and_move(src: Path, dest_dir: Path, serial, acquire_time: str, logger: logging.Logger) -> str:
@@ -367,53 +478,115 @@ def rename_and_move(src: Path, dest_dir: Path, serial, acquire_time: str, logger
 
 
 # =========================
-# 单文件处理
+# 单文件解析（进程池中执行）
 # =========================
-def process_file(file_path: Path,
-                 stats_accounts: dict, stats_cards: dict, used_serials: set[int],
-                 acquire_time: str, author: str,
-                 lock: threading.Lock,
-                 folders: tuple[Path, Path, Path],
-                 logger: logging.Logger,
-                 min_len_digits: int = 12) -> dict | None:
-    registered_dir, skipped_dir, duplicate_dir = folders
-    basename = file_path.name
-    logger.info("开始处理：%s", basename)
+class StageTimer:
+    """按阶段累计耗时（秒）；lap(阶段) 记入距上一次 lap 的时间。随摘要回传主进程，主进程再补 排队等待/搬运。"""
+
+    def __init__(self):
+        self.seconds = {}
+        self._last = time.perf_counter()
+
+    def add(self, stage: str, seconds: float):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        self.add(stage, now - self._last)
+        self._last = now
+
+    def total(self) -> float:
+        return sum(self.seconds.values())
+
+
+class LogBuffer:
+    """
+    与 logging.Logger 同名方法的简易缓冲：解析在子进程中进行，子进程没有 run_log 的 handler，
+    日志先缓存、随结果回传，由主进程按文件顺序写入。
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def log(self, level: int, msg: str, *args):
+        self.records.append((level, msg % args if args else msg))
+
+    def info(self, msg: str, *args):
+        self.log(logging.INFO, msg, *args)
+
+    def warning(self, msg: str, *args):
+        self.log(logging.WARNING, msg, *args)
 
-    # 1) 读“提取”
+    def exception(self, msg: str, *args):
+        self.log(logging.ERROR, (msg % args if args else msg) + '\n' + traceback.format_exc().rstrip())
+
+    def replay(self, logger: logging.Logger):
+        for level, msg in self.records:
+            logger.log(level, '%s', msg)
+
+
+def format_balance_diff(balance: pd.Series) -> str | None:
+    """余额核对结果 -> “YYYY年MM月至YYYY年MM月存在余额差异 余额差异最大为X”；无差异返回 None。"""
+    if pd.isna(balance['首个差异日期']):
+        return None
+    max_val = float(balance['最大差异'])
+    max_val_str = str(int(max_val)) if max_val.is_integer() else f"{max_val:.2f}"
+    return (f"{balance['首个差异日期']:%Y年%m月}至{balance['末个差异日期']:%Y年%m月}"
+            f"存在余额差异 余额差异最大为{max_val_str}")
+
+
+def failed_summary(file_path: Path, logger: LogBuffer | None = None) -> dict:
+    """处理异常的文件：按跳过处理（移入 2被跳过、写入登记日志），详细说明记为 处理异常。"""
     try:
-        tiqu = read_excel_safe(file_path, '提取', dtype=str)
-    except Exception:
-        logger.exception("读取【提取】失败：%s", basename)
-        # 移动到 2被跳过
-        try:
-            shutil.move(str(file_path), str(skipped_dir / basename))
-        except Exception:
-            pass
-        return {'文件名': basename, '*详细说明': '无法读取提取表'}
+        size = file_path.stat().st_size
+    except OSError:
+        size = 0
+    return {'record': {'文件名': file_path.name, '*详细说明': ERROR_NOTE}, 'account': None, 'cards': [],
+            'skip': True, 'logs': logger or LogBuffer(), 'timer': StageTimer(), 'size': size}
 
-    # 2) 读“整理表”（可选，只为币种）
+
+def summarize_statement(file_path: Path, acquire_time: str, author: str,
+                        min_len_digits: int = 12) -> dict:
+    """
+    解析单个流水文件，返回精简摘要（不分配序号、不移动文件）：
+    {'record': 登记行（缺 已取序号）, 'account': 唯一账号或 None, 'cards': 卡号列表,
+     'skip': 是否进 2被跳过, 'logs': LogBuffer, 'timer': StageTimer, 'size': 文件字节数}
+    任何异常都只影响本文件：返回 failed_summary，不中断整批登记。
+    """
+    logger = LogBuffer()
     try:
-        zhengli = read_excel_safe(file_path, '整理表', dtype=str)
+        return _summarize_statement(file_path, acquire_time, author, min_len_digits, logger)
     except Exception:
-        logger.warning("整理表读取失败：%s", basename)
-        zhengli = pd.DataFrame()
+        logger.exception("处理异常：%s", file_path.name)
+        return failed_summary(file_path, logger)
 
-    # 3) 读“账户信息*”（正则+排除）
-    account_info = read_account_info_df(file_path, logger)
+
+def _summarize_statement(file_path: Path, acquire_time: str, author: str,
+                         min_len_digits: int, logger: LogBuffer) -> dict:
+    timer = StageTimer()
+    basename = file_path.name
+    logger.info("开始处理：%s", basename)
+    summary = {'account': None, 'cards': [], 'skip': True, 'logs': logger, 'timer': timer,
+               'size': file_path.stat().st_size}
+
+    # 读“提取”“整理表”“账户信息*”（同一次打开）
+    try:
+        tiqu, zhengli, account_info = read_statement(file_path, logger, timer)
+    except Exception:
+        timer.lap('读取提取')
+        logger.exception("读取【提取】失败：%s", basename)
+        summary['record'] = {'文件名': basename, '*详细说明': '无法读取提取表'}
+        return summary
 
     record = {'文件名': basename}
+    summary['record'] = record
 
     # 账户名
     names = read_unique_values(tiqu, '本账号名称')
     if not names:
         record.update({'账户名': '无账户名'})
-        try:
-            shutil.move(str(file_path), str(skipped_dir / basename))
-        except Exception:
-            pass
         logger.warning("跳过（无账户名）：%s", basename)
-        return record
+        return summary
     record['账户名'] = ';'.join(names)
 
     # 账号
@@ -432,6 +605,7 @@ def process_file(file_path: Path,
     # 币种（来自整理表）
     currency = read_unique_values(zhengli, '交易币种') if not zhengli.empty else []
     record['币种'] = ';'.join(currency)
+    timer.lap('整理号码')
 
     # 开户行 + 开户/销户时间（账户信息*）
     bank = '未匹配成功'
@@ -444,18 +618,19 @@ def process_file(file_path: Path,
         card_series = account_info.get('交易卡号', pd.Series(dtype=str)).map(normalize_number)
         exact_mask = (acc_series == account) | (card_series == account)
         subset = account_info[exact_mask]
+        timer.lap('精确匹配')
 
         # 第二层：数字匹配（仅当精确匹配为空）
         if subset.empty:
-            # 对每一行做 digit_match，命中任一列即算
-            matches = []
-            for idx, row in account_info.iterrows():
-                a = row.get('交易账号')
-                c = row.get('交易卡号')
-                if digit_match(account, a, min_len_digits) or digit_match(account, c, min_len_digits):
-                    matches.append(idx)
+            # 本文件的账户信息只查这一次，建索引不比逐行比较省事；命中任一列即算
+            blank = [None] * len(account_info)
+            accs = acc_series if '交易账号' in account_info.columns else blank
+            crds = card_series if '交易卡号' in account_info.columns else blank
+            matches = [idx for idx, a, c in zip(account_info.index, accs, crds)
+                       if digit_match(account, a, min_len_digits) or digit_match(account, c, min_len_digits)]
             if matches:
                 subset = account_info.loc[matches]
+            timer.lap('数字匹配')
 
         if not subset.empty:
             # 开户行：取第一条命中的银行与网点，直接拼接（无分隔、无空格）
@@ -487,6 +662,7 @@ def process_file(file_path: Path,
                     close_time_fmt = cts.max().strftime('%Y.%m.%d')
 
     record['开户行'] = bank
+    timer.lap('开户信息')
 
     # 详细说明：开户/销户 + 余额差异
     detail_parts = []
@@ -497,42 +673,20 @@ def process_file(file_path: Path,
     if close_time_fmt:
         detail_parts.append(f"销户时间{close_time_fmt}")
 
-    diff_desc = None
-    if '公式校验' in tiqu.columns and '日期' in tiqu.columns:
-        check_series = pd.to_numeric(tiqu['公式校验'], errors='coerce')
-        dates_series = pd.to_datetime(tiqu['日期'], errors='coerce')
-        valid = check_series.notna() & dates_series.notna()
-        if valid.any():
-            chk = check_series[valid]
-            dts = dates_series[valid]
-            # 非“近似零”的视为差异
-            nonzero_mask = ~np.isclose(chk.values.astype(float), 0.0, atol=0.005)
-            if nonzero_mask.any():
-                nz_idx = chk.index[nonzero_mask]
-                first_date = dts.loc[nz_idx[0]].strftime('%Y年%m月')
-                last_date = dts.loc[nz_idx[-1]].strftime('%Y年%m月')
-                # 最大绝对差异
-                max_idx = (chk.abs()).idxmax()
-                max_val = chk.loc[max_idx]
-                max_val_str = (
-                    str(int(max_val)) if pd.notna(max_val) and float(max_val).is_integer()
-                    else f"{float(max_val):.2f}"
-                )
-                diff_desc = f"{first_date}至{last_date}存在余额差异 余额差异最大为{max_val_str}"
+    # 余额差异 + 交易期间：公式校验/日期 各只转换一次，交给余额核对内核一次算出
+    check, dates = typed_columns(tiqu['公式校验'] if '公式校验' in tiqu.columns else None,
+                                 tiqu['日期'] if '日期' in tiqu.columns else None)
+    balance = reconcile_balances(check, dates, np.array([0, len(check)])).iloc[0]
+    diff_desc = format_balance_diff(balance)
     if diff_desc:
         detail_parts.append(diff_desc)
 
     record['*详细说明'] = f"{acquire_time}取得：" + '；'.join(detail_parts)
+    timer.lap('余额差异')
 
     # 交易期间
-    if '日期' in tiqu.columns and not tiqu['日期'].dropna().empty:
-        dts = pd.to_datetime(tiqu['日期'].dropna(), errors='coerce').dropna()
-        if not dts.empty:
-            start = dts.min().strftime('%Y.%m.%d')
-            end = dts.max().strftime('%Y.%m.%d')
-            record['已取得交易期间'] = f'{start}-{end}'
-        else:
-            record['已取得交易期间'] = ''
+    if pd.notna(balance['起始日期']):
+        record['已取得交易期间'] = f"{balance['起始日期']:%Y.%m.%d}-{balance['截止日期']:%Y.%m.%d}"
     else:
         record['已取得交易期间'] = ''
 
@@ -542,43 +696,188 @@ def process_file(file_path: Path,
     record['取得时间'] = acquire_time
     record['*是否需重取'] = '否'
     record['⑤编制人'] = author
+    timer.lap('交易期间')
+
+    summary.update(account=account, cards=cards, skip=False)
+    return summary
 
-    # ===== 原子区：查→分→写映射（锁内） =====
-    assigned_serial = None
-    is_duplicate = False
-    with lock:
-        existing_serial = find_existing_serial(account, cards, stats_accounts, stats_cards)
-        if existing_serial is not None:
-            assigned_serial = existing_serial
-            is_duplicate = True
-        else:
-            assigned_serial = next_serial(used_serials)
-            if account:
-                stats_accounts[account] = assigned_serial
-            for c in cards:
-                stats_cards[c] = assigned_serial
 
-    # 记录序号
-    record['已取序号'] = f'已取序号{assigned_serial}' if is_duplicate else assigned_serial
+# =========================
+# 序号分配（单线程协调）与文件搬运
+# =========================
+def assign_serial(account: str | None, cards: list[str], serials: SerialAllocator,
+                  account_map: dict, card_map: dict, fuzzy: DigitIndex | None = None) -> tuple[int, bool]:
+    """查→分→写映射，返回 (序号, 是否重复)。只在协调线程中按文件顺序调用，不需要加锁。"""
+    existing_serial = find_existing_serial(account, cards, account_map, card_map, fuzzy)
+    if existing_serial is not None:
+        return existing_serial, True
+    serial = serials.allocate()
+    if account:
+        account_map[account] = serial
+    for c in cards:
+        card_map[c] = serial
+    if fuzzy is not None:
+        for number in ([account] if account else []) + list(cards):
+            fuzzy.add(number, serial)
+    return serial, False
 
-    # ===== 锁外：重命名/搬运（I/O）=====
-    dest = duplicate_dir if is_duplicate else registered_dir
+
+def move_statement(file_path: Path, record: dict, dest: Path, serial, is_duplicate: bool,
+                   acquire_time: str, logger: logging.Logger, journal=None,
+                   timer: StageTimer | None = None) -> dict:
+    """
+    搬运阶段：跳过的文件原名移入 2被跳过，其余重命名后移入 1已登记/3重复账号，并回填最终文件名。
+    搬运成功后在登记日志中记一条 moved；给了 timer 时记入 搬运 耗时。
+    """
+    if timer:
+        t0 = time.perf_counter()
+        try:
+            return move_statement(file_path, record, dest, serial, is_duplicate, acquire_time, logger, journal)
+        finally:
+            timer.add('搬运', time.perf_counter() - t0)
+    basename = file_path.name
+    if serial is None:
+        try:
+            shutil.move(str(file_path), str(dest / basename))
+        except Exception:
+            return record
+        if journal:
+            journal.append({'event': 'moved', 'file': basename, 'name': basename})
+        return record
     try:
-        final_name = rename_and_move(file_path, dest, assigned_serial, acquire_time, logger)
-        record['文件名'] = final_name
+        record['文件名'] = rename_and_move(file_path, dest, serial, acquire_time, logger)
+        if journal:
+            journal.append({'event': 'moved', 'file': basename, 'name': record['文件名']})
     except Exception:
         # 搬运失败，仍返回记录
         pass
-
     logger.info("%s 完成：%s | 序号=%s | 重复=%s", basename, record.get('文件名', basename),
-                assigned_serial, is_duplicate)
+                serial, is_duplicate)
     return record
 
 
+# =========================
+# 运行统计
+# =========================
+def build_run_report(profiles: list[tuple[str, int, StageTimer]], wall_seconds: float,
+                     executor: str, workers: int) -> dict:
+    """
+    profiles：[(文件名, 字节数, StageTimer)]。
+    返回各阶段的合计/分位数/最大值、最慢的 SLOWEST_FILES 个文件，以及逐文件明细。
+    排队等待 是排在慢文件之后的时间、不是文件自身的开销：单列为 queue_wait，不计入 total，也不参与最慢排名。
+    """
+    per_file = [{'file': name, 'size': size,
+                 'total': round(timer.total() - timer.seconds.get(QUEUE_STAGE, 0.0), 4),
+                 'queue_wait': round(timer.seconds.get(QUEUE_STAGE, 0.0), 4),
+                 'stages': {k: round(v, 4) for k, v in timer.seconds.items() if k != QUEUE_STAGE}}
+                for name, size, timer in profiles]
+    stage_names = list(dict.fromkeys(k for item in per_file for k in item['stages']))
+    stages = {}
+    for stage in stage_names + [QUEUE_STAGE]:
+        if stage == QUEUE_STAGE:
+            values = np.array([item['queue_wait'] for item in per_file])
+        else:
+            values = np.array([item['stages'][stage] for item in per_file if stage in item['stages']])
+        if not values.size:
+            continue
+        stats = {'count': int(values.size), 'total': round(float(values.sum()), 3)}
+        for q, v in zip(REPORT_PERCENTILES, np.percentile(values, REPORT_PERCENTILES)):
+            stats[f'p{q}'] = round(float(v), 4)
+        stats['max'] = round(float(values.max()), 4)
+        stages[stage] = stats
+    slowest = sorted(per_file, key=lambda item: item['total'], reverse=True)[:SLOWEST_FILES]
+    return {
+        'files': len(per_file),
+        'wall_seconds': round(wall_seconds, 3),
+        'executor': executor,
+        'workers': workers,
+        'bytes': sum(item['size'] for item in per_file),
+        'stages': stages,
+        'slowest': slowest,
+        'per_file': per_file,
+    }
+
+
+def write_run_report(path: Path, report: dict, logger: logging.Logger) -> None:
+    """摘要写入 run_log，完整统计写入 JSON。"""
+    logger.info("运行统计：文件 %d 个 | 合计 %.1f MB | 墙钟 %.1fs | %s x %d",
+                report['files'], report['bytes'] / 1024 / 1024, report['wall_seconds'],
+                report['executor'], report['workers'])
+    for stage, st in report['stages'].items():
+        logger.info("  阶段 %s：%d 次 | 合计 %.2fs | %s | 最大 %.3fs", stage, st['count'], st['total'],
+                    ' | '.join(f"p{q} {st[f'p{q}']:.3f}s" for q in REPORT_PERCENTILES), st['max'])
+    if report['slowest']:
+        logger.info("最慢的 %d 个文件：", len(report['slowest']))
+        for item in report['slowest']:
+            top = max(item['stages'].items(), key=lambda kv: kv[1], default=('-', 0.0))
+            logger.info("  %.3fs | %.1f KB | %s（最慢阶段：%s %.3fs | 排队等待 %.3fs）", item['total'],
+                        item['size'] / 1024, item['file'], top[0], top[1], item['queue_wait'])
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    logger.info("运行统计已写入：%s", path)
+
+
+# =========================
+# 登记日志（断点续跑）
+# =========================
+class RegisterJournal:
+    """
+    追加写的 JSONL 登记日志，每条决定写入后立即 fsync：
+    {'event': 'assign', 'file', 'serial', 'duplicate', 'dest', 'account', 'cards', 'record'}  序号已定、尚未搬运
+    {'event': 'moved', 'file', 'name'}                                                           搬运完成及最终文件名
+    协调线程与搬运线程都会写入，内部加锁。
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._f = open(path, 'a', encoding='utf-8')
+
+    def append(self, entry: dict):
+        line = json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            self._f.write(line)
+            self._f.flush()
+            os.fsync(self._f.fileno())
+
+    def close(self):
+        with self._lock:
+            self._f.close()
+
+
+def load_journal(path: Path, logger: logging.Logger) -> dict:
+    """读回登记日志，返回 {文件名: assign 条目}，已搬运的条目带 'name'；崩溃时写了一半的末行忽略。"""
+    entries = {}
+    if not path.exists():
+        return entries
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logger.warning("登记日志第 %d 行不完整，已忽略", line_no)
+                continue
+            if entry.get('event') == 'assign':
+                entries[entry['file']] = entry
+            elif entry.get('event') == 'moved' and entry.get('file') in entries:
+                entries[entry['file']]['name'] = entry['name']
+    return entries
+
+
 # =========================
 # 主流程
 # =========================
 def main():
+    parser = argparse.ArgumentParser(description="统计表登记信息生成：分配序号、归档流水并生成《登记信息.xlsx》")
+    parser.add_argument('--resume', action='store_true',
+                        help='按登记日志续跑：沿用已分配的序号，只处理剩余文件')
+    parser.add_argument('--fuzzy-min-len', type=int, default=0,
+                        help='查重复账号时按数字子串匹配统计表中的账号/卡号：较短号码至少几位（如 12）；0 为只按完全相同匹配')
+    add_parallel_arguments(parser)
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
     # 输入
     stats_path_str = clean_input_path(input('请输入统计表路径: '))
     folder_str = input('请输入拆分后流水的存放路径: ').strip()
@@ -591,14 +890,35 @@ def main():
     logger = setup_logger(folder)
     logger.info("=== 任务开始 ===")
 
+    # 登记日志：上次运行未写出登记信息时保留，必须 --resume 续跑，避免重复分配序号
+    journal_path = folder / JOURNAL_FILE_NAME
+    if journal_path.exists() and not args.resume:
+        logger.error("检测到未完成的登记日志：%s", journal_path)
+        print("检测到上次未完成的登记，请加 --resume 参数续跑。")
+        return
+    journaled = load_journal(journal_path, logger) if args.resume else {}
+    if journaled:
+        logger.info("续跑：登记日志中已有 %d 个文件的记录", len(journaled))
+
     # 目录与输出
     ensure_dirs(folder)
     output_path = folder / OUTPUT_FILE_NAME
-    wb = create_output_book(output_path)
-    ws = wb.active
-
-    # 读统计表
-    used_serials, stats_accounts, stats_cards = read_statistics_info(stats_path, logger)
+    output_sheets, output_active = read_output_rows(output_path)
+    output_rows = output_sheets[output_active][1]  # 新记录追加到活动表
+
+    # 读统计表；续跑时并入日志中已分配的序号与映射
+    new_serials = [e['serial'] for e in journaled.values() if e['serial'] is not None and not e['duplicate']]
+    serials, stats_accounts, stats_cards = read_statistics_info(stats_path, logger, new_serials)
+    for e in journaled.values():
+        if e['serial'] is not None and not e['duplicate']:
+            if e['account']:
+                stats_accounts[e['account']] = e['serial']
+            for c in e['cards']:
+                stats_cards[c] = e['serial']
+    # 数字匹配索引只在这里建一次，所有流水都在其中查找
+    fuzzy = build_serial_index(stats_accounts, stats_cards, args.fuzzy_min_len) if args.fuzzy_min_len else None
+    # 已定序号但尚未搬运的文件：不重新解析，直接按日志补搬运
+    unmoved = {name: e for name, e in journaled.items() if 'name' not in e}
 
     # 待处理文件列表
     excluded_names = {
@@ -618,28 +938,25 @@ def main():
                 continue  # 不遍历子目录
         if name in excluded_names:
             continue
-        if name.startswith('~$'):
+        if name.startswith('~$') or name in unmoved:
             continue
         if name.lower().endswith(('.xls', '.xlsx', '.xlsm')):
             files.append(p)
 
-    if not files:
+    if not files and not journaled:
         print("没有找到可处理的 Excel 文件。")
         logger.info("没有找到可处理的 Excel 文件。")
         return
 
-    # 线程数
-    thread_count = decide_thread_count(len(files))
-    logger.info("文件数=%d | 线程数=%d", len(files), thread_count)
+    # 并发数：进程池默认按 CPU 数；线程池沿用原来的 2x CPU
+    workers = args.workers or (decide_thread_count(len(files)) if args.executor == 'thread' else None)
+    worker_count = decide_worker_count(len(files), workers)
+    logger.info("文件数=%d | 并行方式=%s | 并发数=%d", len(files), args.executor, worker_count)
 
-    # 处理
-    lock = threading.Lock()
     registered = folder / SUBDIR_REGISTERED
     skipped = folder / SUBDIR_SKIPPED
     duplicated = folder / SUBDIR_DUPLICATE
-    folders = (registered, skipped, duplicated)
 
-    results = []
     stats = {'ok': 0, 'dup': 0, 'skip': 0}
     total = len(files)
     done = 0
@@ -654,29 +971,62 @@ def main():
             return f"{m:02d}:{s:02d}"
         logger.info("进度: %d/%d | 用时 %s | 预计剩余 %s", done, total, fmt(elapsed), fmt(remain))
 
-    if thread_count == 1:
-        for f in files:
-            rec = process_file(f, stats_accounts, stats_cards, used_serials,
-                               acquire_time, author, lock, folders, logger)
+    # 三段流水线：
+    #   解析（进程池）→ 协调（主线程，按文件列表顺序查/分序号，结果与完成先后无关）→ 搬运（单线程，重名后缀顺序确定）
+    order = {f: i for i, f in enumerate(files)}
+    ready = {}
+    arrived = {}
+    next_idx = 0
+    moves = []
+    profiles = []
+    done_records = [{**e['record'], '文件名': e['name']} for e in journaled.values() if 'name' in e]
+    parse = functools.partial(summarize_statement, acquire_time=acquire_time, author=author)
+    journal = RegisterJournal(journal_path)
+    with ThreadPoolExecutor(max_workers=1) as mover:
+        for name, e in unmoved.items():
+            path = folder / name
+            if not path.exists():
+                logger.warning("登记日志中的文件已不在原处，按原文件名登记：%s", name)
+                done_records.append(e['record'])
+                continue
+            moves.append(mover.submit(move_statement, path, e['record'], folder / e['dest'], e['serial'],
+                                      e['duplicate'], acquire_time, logger, journal))
+        for f, summary in iter_parallel(parse, files, args.executor, workers, return_exceptions=True):
+            if isinstance(summary, BaseException):
+                # 子进程崩溃等 summarize_statement 自身接不住的异常
+                logger.error("处理异常：%s | %r", f.name, summary)
+                summary = failed_summary(f)
+            ready[order[f]] = summary
+            arrived[order[f]] = time.perf_counter()
             done += 1
             log_progress()
-            if rec:
-                results.append(rec)
-    else:
-        with ThreadPoolExecutor(max_workers=thread_count) as executor:
-            futs = [executor.submit(process_file, f, stats_accounts, stats_cards, used_serials,
-                                    acquire_time, author, lock, folders, logger)
-                    for f in files]
-            for fut in as_completed(futs):
-                try:
-                    rec = fut.result()
-                except Exception as e:
-                    logger.exception("处理线程异常：%s", e)
-                    rec = None
-                done += 1
-                log_progress()
-                if rec:
-                    results.append(rec)
+            while next_idx in ready:
+                summary = ready.pop(next_idx)
+                path = files[next_idx]
+                timer = summary['timer']
+                timer.add(QUEUE_STAGE, time.perf_counter() - arrived.pop(next_idx))  # 等前序文件解析完
+                profiles.append((path.name, summary['size'], timer))
+                next_idx += 1
+                summary['logs'].replay(logger)
+                if summary['skip']:
+                    serial, is_duplicate, dest = None, False, skipped
+                else:
+                    serial, is_duplicate = assign_serial(summary['account'], summary['cards'], serials,
+                                                         stats_accounts, stats_cards, fuzzy)
+                    summary['record']['已取序号'] = f'已取序号{serial}' if is_duplicate else serial
+                    dest = duplicated if is_duplicate else registered
+                # 先落盘决定再搬运：崩溃后 --resume 可据此补搬运、重建序号
+                journal.append({'event': 'assign', 'file': path.name, 'serial': serial,
+                                'duplicate': is_duplicate, 'dest': dest.name,
+                                'account': summary['account'], 'cards': summary['cards'],
+                                'record': summary['record']})
+                moves.append(mover.submit(move_statement, path, summary['record'], dest, serial,
+                                          is_duplicate, acquire_time, logger, journal, timer))
+    journal.close()
+    results = done_records + [fut.result() for fut in moves]
+    if profiles:
+        report = build_run_report(profiles, time.monotonic() - t0, args.executor, worker_count)
+        write_run_report(folder / REPORT_FILE_NAME, report, logger)
 
     # （可选）按序号排序写出，便于阅读
     def extract_serial(v):
@@ -692,39 +1042,23 @@ def main():
 
     # 汇总写出（原子替换，避免占用损坏）
     for rec in results:
-        ws.append([
-            rec.get('文件名', ''),
-            rec.get('已取序号', ''),
-            rec.get('是否整理', ''),
-            rec.get('币种', ''),
-            rec.get('账户名', ''),
-            rec.get('开户行', ''),
-            rec.get('账号', ''),
-            rec.get('卡号', ''),
-            rec.get('是否取得', ''),
-            rec.get('取得时间', ''),
-            rec.get('*详细说明', ''),
-            rec.get('*是否需重取', ''),
-            rec.get('⑤编制人', ''),
-            rec.get('已取得交易期间', ''),
-        ])
+        output_rows.append([rec.get(h, '') for h in OUTPUT_HEADERS])
         # 统计
         v = rec.get('已取序号', '')
         if isinstance(v, str) and v.startswith('已取序号'):
             stats['dup'] += 1
         elif isinstance(v, int):
             stats['ok'] += 1
-        if rec.get('*详细说明', '') == '无法读取提取表' or rec.get('账户名', '') == '无账户名':
+        if rec.get('*详细说明', '') in ('无法读取提取表', ERROR_NOTE) or rec.get('账户名', '') == '无账户名':
             stats['skip'] += 1
 
-    tmp_path = output_path.with_suffix('.tmp.xlsx')
     try:
-        wb.save(tmp_path)
-        os.replace(tmp_path, output_path)
+        save_output_book(output_path, output_sheets, output_active)
     except PermissionError:
         logger.error("保存失败：目标文件可能正被 Excel 打开 -> %s", output_path)
-        print("保存失败：请关闭正在打开的《登记信息.xlsx》后重试。")
+        print("保存失败：请关闭正在打开的《登记信息.xlsx》后加 --resume 参数重试。")
         return
+    journal_path.unlink()  # 登记信息已写出，日志完成使命
 
     logger.info("登记信息已生成: %s", output_path)
     logger.info("统计：登记=%d | 重复=%d | 跳过=%d", stats['ok'], stats['dup'], stats['skip'])
@@ -734,6 +1068,7 @@ def main():
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # PyInstaller 打包后进程池需要
     try:
         main()
     except Exception as e:
@@ -0,0 +1,341 @@
+# coding: utf-8
+r"""
+解析缓存
+- 把解析好的工作表存成列式文件（Parquet），同一份文件、同一种读法再次读取时直接加载，跳过 openpyxl 的 XML 解析
+- 文件指纹：绝对路径 + 大小 + 修改时间 -> 内容哈希（sha1）；指纹未变时不重新计算哈希
+- 缓存键：内容哈希 + 读法（工作表、dtype 等参数、pandas 版本）；文件被移动/复制后仍能命中
+- 按总大小做 LRU 淘汰：超过上限时删除最久未使用的条目
+- Parquet 存不下的表（混合类型列、非字符串列名等）改存 pickle；未安装 pyarrow 时全部存 pickle
+- 关闭缓存：命令行 --no-cache，或环境变量 JA_NO_CACHE=1
+- 缓存目录：默认 ~/.judicial_audit_cache，可用 --cache-dir 或环境变量 JA_CACHE_DIR 指定
+- 容量上限：默认 4096 MB，可用 --cache-max-mb 或环境变量 JA_CACHE_MAX_MB 指定
+- 多进程：configure() 会同步设置上述环境变量，子进程自动继承
+- WorkbookSession：同一工作簿的多张表共用一次打开（.xls 为同一个 xlrd book），可只取部分列；缓存全部命中时不打开文件
+
+依赖：pandas；pyarrow（可选）
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+DEFAULT_CACHE_DIR = Path.home() / '.judicial_audit_cache'
+DEFAULT_MAX_MB = 4096
+INDEX_FILE = 'index.sqlite'
+HASH_CHUNK = 1 << 20
+
+_config = {
+    'enabled': os.environ.get('JA_NO_CACHE', '') not in ('1', 'true', 'yes'),
+    'cache_dir': Path(os.environ.get('JA_CACHE_DIR') or DEFAULT_CACHE_DIR),
+    'max_bytes': int(os.environ.get('JA_CACHE_MAX_MB') or DEFAULT_MAX_MB) * 1024 * 1024,
+}
+_init_lock = threading.Lock()
+_initialized_dirs = set()
+
+
+# =========================
+# 配置
+# =========================
+def configure(enabled: bool | None = None, cache_dir: str | Path | None = None,
+              max_mb: int | None = None) -> None:
+    """
+    修改缓存设置；参数为 None 时保持不变。
+    设置同时写回环境变量，进程池（Windows 为 spawn 方式）启动的子进程导入本模块时沿用同一设置。
+    """
+    if enabled is not None:
+        _config['enabled'] = enabled
+        os.environ['JA_NO_CACHE'] = '' if enabled else '1'
+    if cache_dir:
+        _config['cache_dir'] = Path(cache_dir)
+        os.environ['JA_CACHE_DIR'] = str(cache_dir)
+    if max_mb:
+        _config['max_bytes'] = int(max_mb) * 1024 * 1024
+        os.environ['JA_CACHE_MAX_MB'] = str(int(max_mb))
+
+
+def cache_enabled() -> bool:
+    return _config['enabled']
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    """给已有的 argparse 解析器加上缓存相关参数。"""
+    parser.add_argument('--no-cache', action='store_true', help='不读写解析缓存')
+    parser.add_argument('--cache-dir', help='解析缓存目录')
+    parser.add_argument('--cache-max-mb', type=int, help='解析缓存容量上限（MB）')
+
+
+def configure_from_args(args: argparse.Namespace) -> None:
+    configure(enabled=False if args.no_cache else None, cache_dir=args.cache_dir, max_mb=args.cache_max_mb)
+
+
+def configure_from_argv(argv: list[str] | None = None) -> None:
+    """供没有命令行参数的脚本使用：只识别缓存相关参数，其余参数忽略。"""
+    parser = argparse.ArgumentParser(add_help=False)
+    add_cache_arguments(parser)
+    args, _ = parser.parse_known_args(argv)
+    configure_from_args(args)
+
+
+# =========================
+# 索引库
+# =========================
+@contextmanager
+def _index():
+    """打开索引库（首次使用时建表），退出时提交并关闭连接。"""
+    cache_dir = _config['cache_dir']
+    with _init_lock:
+        if cache_dir not in _initialized_dirs:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(cache_dir / INDEX_FILE, timeout=60)
+            try:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('CREATE TABLE IF NOT EXISTS files ('
+                             'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha1 TEXT)')
+                conn.execute('CREATE TABLE IF NOT EXISTS entries ('
+                             'key TEXT PRIMARY KEY, data_file TEXT, payload TEXT, '
+                             'bytes INTEGER, last_used REAL)')
+                conn.commit()
+            finally:
+                conn.close()
+            _initialized_dirs.add(cache_dir)
+    conn = sqlite3.connect(cache_dir / INDEX_FILE, timeout=60)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def content_hash(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_fingerprint(path: str | Path) -> tuple[int, int, str]:
+    """返回 (大小, 修改时间ns, sha1)；大小和修改时间与索引库一致时直接复用记录的哈希。"""
+    path = Path(path).resolve()
+    st = path.stat()
+    key = str(path)
+    with _index() as conn:
+        row = conn.execute('SELECT size, mtime_ns, sha1 FROM files WHERE path = ?', (key,)).fetchone()
+    if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+        return st.st_size, st.st_mtime_ns, row[2]
+    sha1 = content_hash(path)
+    with _index() as conn:
+        conn.execute('INSERT OR REPLACE INTO files (path, size, mtime_ns, sha1) VALUES (?, ?, ?, ?)',
+                     (key, st.st_size, st.st_mtime_ns, sha1))
+    return st.st_size, st.st_mtime_ns, sha1
+
+
+def _entry_key(path: str | Path, spec) -> str:
+    _, _, sha1 = file_fingerprint(path)
+    spec_text = json.dumps([spec, pd.__version__], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(f'{sha1}|{spec_text}'.encode('utf-8')).hexdigest()
+
+
+def _touch(conn: sqlite3.Connection, key: str) -> None:
+    conn.execute('UPDATE entries SET last_used = ? WHERE key = ?', (time.time(), key))
+
+
+def _evict(conn: sqlite3.Connection) -> None:
+    """总大小超限时按最久未使用删除。"""
+    total = conn.execute('SELECT COALESCE(SUM(bytes), 0) FROM entries').fetchone()[0]
+    if total <= _config['max_bytes']:
+        return
+    for key, data_file, size in conn.execute(
+            'SELECT key, data_file, bytes FROM entries ORDER BY last_used').fetchall():
+        if data_file:
+            try:
+                os.remove(_config['cache_dir'] / data_file)
+            except OSError:
+                pass
+        conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+        total -= size
+        if total <= _config['max_bytes']:
+            break
+
+
+# =========================
+# DataFrame 存取
+# =========================
+def _restore_missing(df: pd.DataFrame) -> pd.DataFrame:
+    """Parquet 读回的 object 列空值为 None，统一还原成 read_excel 的 NaN。"""
+    for col in df.columns[df.dtypes == object]:
+        if df[col].isna().any():
+            df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def _load_frame(data_file: str) -> pd.DataFrame:
+    path = _config['cache_dir'] / data_file
+    if data_file.endswith('.parquet'):
+        return _restore_missing(pd.read_parquet(path))
+    return pd.read_pickle(path)
+
+
+def _store_frame(key: str, df: pd.DataFrame) -> str:
+    """先写临时文件再原子替换；Parquet 失败时退回 pickle。"""
+    cache_dir = _config['cache_dir']
+    tmp = cache_dir / f'{key}.{uuid.uuid4().hex}.tmp'
+    if HAS_PYARROW:
+        try:
+            df.to_parquet(tmp, index=True)
+            os.replace(tmp, cache_dir / f'{key}.parquet')
+            return f'{key}.parquet'
+        except Exception:
+            if tmp.exists():
+                os.remove(tmp)
+    df.to_pickle(tmp)
+    os.replace(tmp, cache_dir / f'{key}.pkl')
+    return f'{key}.pkl'
+
+
+def cached_frame(path: str | Path, spec, loader) -> pd.DataFrame:
+    """
+    通用入口：按 (文件内容, spec) 查缓存，未命中时调用 loader() 解析并写入缓存。
+    spec 需能 JSON 序列化（或可转成字符串），用来区分同一文件的不同读法。
+    缓存本身出错时不影响结果，直接按未命中处理。
+    """
+    if not _config['enabled']:
+        return loader()
+    try:
+        key = _entry_key(path, spec)
+        with _index() as conn:
+            row = conn.execute('SELECT data_file FROM entries WHERE key = ? AND data_file IS NOT NULL',
+                               (key,)).fetchone()
+            if row:
+                df = _load_frame(row[0])
+                _touch(conn, key)
+                return df
+    except Exception:
+        return loader()
+
+    df = loader()
+    if isinstance(df, pd.DataFrame):
+        try:
+            data_file = _store_frame(key, df)
+            size = os.path.getsize(_config['cache_dir'] / data_file)
+            with _index() as conn:
+                conn.execute('INSERT OR REPLACE INTO entries (key, data_file, payload, bytes, last_used) '
+                             'VALUES (?, ?, NULL, ?, ?)', (key, data_file, size, time.time()))
+                _evict(conn)
+        except Exception:
+            pass
+    return df
+
+
+def cached_value(path: str | Path, spec, loader):
+    """同 cached_frame，用于可 JSON 序列化的小结果（如工作表名列表），直接存在索引库里。"""
+    if not _config['enabled']:
+        return loader()
+    try:
+        key = _entry_key(path, spec)
+        with _index() as conn:
+            row = conn.execute('SELECT payload FROM entries WHERE key = ? AND payload IS NOT NULL',
+                               (key,)).fetchone()
+            if row:
+                _touch(conn, key)
+                return json.loads(row[0])
+    except Exception:
+        return loader()
+
+    value = loader()
+    try:
+        payload = json.dumps(value, ensure_ascii=False)
+        with _index() as conn:
+            conn.execute('INSERT OR REPLACE INTO entries (key, data_file, payload, bytes, last_used) '
+                         'VALUES (?, NULL, ?, ?, ?)', (key, payload, len(payload), time.time()))
+    except Exception:
+        pass
+    return value
+
+
+# =========================
+# pandas 读取的缓存版本
+# =========================
+def read_excel_cached(path: str | Path, sheet_name=0, **kwargs) -> pd.DataFrame:
+    """pd.read_excel 的缓存版本；一次读多张表（sheet_name 为 None/列表）时不走缓存。"""
+    if sheet_name is None or isinstance(sheet_name, list):
+        return pd.read_excel(path, sheet_name=sheet_name, **kwargs)
+    spec = {'read_excel': sheet_name, **kwargs}
+    return cached_frame(path, spec, lambda: pd.read_excel(path, sheet_name=sheet_name, **kwargs))
+
+
+def sheet_names_cached(path: str | Path, engine: str | None = None) -> list[str]:
+    """工作表名列表的缓存版本。"""
+    def load():
+        with pd.ExcelFile(path, engine=engine) as xf:
+            return list(xf.sheet_names)
+    return cached_value(path, {'sheet_names': engine}, load)
+
+
+class WorkbookSession:
+    """
+    一个工作簿只打开一次：列工作表名、解析需要的表和列都走缓存，缓存未命中时才打开文件，
+    之后的表复用同一个 pd.ExcelFile。用 with 或 close() 释放；Windows 下关闭前不能移动该文件。
+    """
+
+    def __init__(self, path: str | Path, engine: str | None = None):
+        self.path = Path(path)
+        self.engine = engine or excel_engine(self.path)
+        self._book = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def book(self) -> pd.ExcelFile:
+        if self._book is None:
+            self._book = pd.ExcelFile(self.path, engine=self.engine)
+        return self._book
+
+    def sheet_names(self) -> list[str]:
+        return cached_value(self.path, {'sheet_names': self.engine}, lambda: list(self.book.sheet_names))
+
+    def parse(self, sheet_name, usecols=None, dtype=str) -> pd.DataFrame:
+        """解析一张表；usecols 为列名集合时只保留这些列（表中没有的列忽略）。"""
+        cols = sorted(usecols) if usecols is not None else None
+
+        def load():
+            return self.book.parse(sheet_name, dtype=dtype,
+                                   usecols=(lambda c: c in cols) if cols is not None else None)
+        spec = {'parse': sheet_name, 'dtype': dtype, 'usecols': cols, 'engine': self.engine}
+        return cached_frame(self.path, spec, load)
+
+    def close(self) -> None:
+        if self._book is not None:
+            self._book.close()
+            self._book = None
+
+
+def excel_engine(path: str | Path) -> str | None:
+    """按扩展名选择引擎：xlsx/xlsm 用 openpyxl，xls 用 xlrd（需 xlrd==1.2.0），其余交给 pandas 判断。"""
+    suf = Path(path).suffix.lower()
+    if suf in ('.xlsx', '.xlsm'):
+        return 'openpyxl'
+    if suf == '.xls':
+        return 'xlrd'
+    return None
@@ -0,0 +1,63 @@
+# coding: utf-8
+r"""
+账户目录
+- 由《银行账户信息》一次性建立 交易账号/交易卡号 -> 行号 的哈希索引
+- 匹配规则沿用原脚本：先按交易账号匹配，匹配不到再按交易卡号匹配；多条命中取第一条
+- 整列匹配走 Series.map（哈希连接），不再对每一行流水重新筛选整张账户信息表
+
+依赖：pandas
+"""
+
+import pandas as pd
+
+
+NAME_COLUMN = '账户开户名称'
+BANK_COLUMN = '账号开户银行'
+
+
+class AccountDirectory:
+    """账号 → 卡号 → 户名/开户银行 的查找表，只在构造时扫描一次账户信息。"""
+
+    def __init__(self, account_info: pd.DataFrame):
+        self.info = account_info.reset_index(drop=True)
+        self._by_account = self._first_positions('交易账号')
+        self._by_card = self._first_positions('交易卡号')
+
+    def _first_positions(self, column: str) -> dict:
+        """值 -> 第一次出现的行号；空值不参与匹配（与 `==` 筛选一致）。"""
+        if column not in self.info.columns:
+            return {}
+        keys = self.info[column]
+        keys = keys[keys.notna() & ~keys.duplicated()]
+        return dict(zip(keys.tolist(), keys.index.tolist()))
+
+    def positions(self, accounts: pd.Series, cards: pd.Series | None = None) -> pd.Series:
+        """整列匹配：返回账户信息中的行号，优先交易账号，其次交易卡号；匹配不到为 NaN。"""
+        pos = accounts.map(self._by_account)
+        if cards is not None:
+            pos = pos.fillna(cards.map(self._by_card))
+        return pos
+
+    def column_for(self, column: str, accounts: pd.Series, cards: pd.Series | None = None,
+                   default='') -> pd.Series:
+        """
+        整列取账户信息中的某一列（如账户开户名称）。
+        匹配不到的行填 default；匹配到但原值为空的行保留空值，与逐行筛选的结果一致。
+        """
+        out = pd.Series(default, index=accounts.index, dtype=object)
+        if column not in self.info.columns:
+            return out
+        pos = self.positions(accounts, cards)
+        hit = pos.notna()
+        if hit.any():
+            values = self.info[column].to_numpy(dtype=object)
+            out[hit] = values[pos[hit].astype(int).to_numpy()]
+        return out
+
+    def lookup(self, account, column: str, default: str = '') -> str:
+        """按交易账号取单个值（不回退卡号），空值返回 default；用于按账号分组输出时取户名/开户银行。"""
+        pos = self._by_account.get(account)
+        if pos is None or column not in self.info.columns:
+            return default
+        value = self.info.at[pos, column]
+        return default if pd.isna(value) else value
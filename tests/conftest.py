@@ -0,0 +1,52 @@
+import re
+import sys
+import zipfile
+import builtins
+from pathlib import Path
+from importlib.machinery import SourceFileLoader
+from importlib.util import spec_from_loader, module_from_spec
+
+import pytest
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent / 'python代码'
+sys.path.insert(0, str(SCRIPT_DIR))
+
+
+def load_script(name: str):
+    """按文件名加载 python代码 下的脚本（部分脚本没有 .py 扩展名）。"""
+    path = SCRIPT_DIR / name
+    loader = SourceFileLoader(name.replace('.py', ''), str(path))
+    module = module_from_spec(spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    return module
+
+
+def stale_dimension(path, ref: str = 'A1:A1') -> None:
+    """把工作簿各工作表的 <dimension> 标记改成过期的 ref，模拟其他程序写出的不准确的尺寸。"""
+    path = Path(path)
+    with zipfile.ZipFile(path) as src:
+        items = [(info, src.read(info.filename)) for info in src.infolist()]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for info, data in items:
+            if info.filename.startswith('xl/worksheets/sheet'):
+                text = data.decode('utf-8')
+                if '<dimension' in text:
+                    text = re.sub(r'<dimension ref="[^"]*"\s*/>', f'<dimension ref="{ref}"/>', text)
+                else:
+                    text = re.sub(r'(<sheetPr[^>]*/>|<sheetPr.*?</sheetPr>|<worksheet[^>]*>)',
+                                  lambda m: m.group(0) + f'<dimension ref="{ref}"/>', text, count=1)
+                data = text.encode('utf-8')
+            dst.writestr(info, data)
+
+
+@pytest.fixture
+def answer_inputs(monkeypatch):
+    """按提示语回答 input()：answers 为 [(提示语片段, 回答)]，未匹配的提示回答空串。"""
+    def install(answers):
+        def fake_input(prompt=''):
+            for key, value in answers:
+                if key in prompt:
+                    return value
+            return ''
+        monkeypatch.setattr(builtins, 'input', fake_input)
+    return install
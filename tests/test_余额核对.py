@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from 余额核对 import RESULT_COLUMNS, typed_columns, stack_groups, reconcile_balances, reconcile_frame
+
+# 随机数据里有无法解析的日期，pandas 会提示逐个解析
+pytestmark = pytest.mark.filterwarnings('ignore:Could not infer format')
+
+
+def old_reconcile(check, dates) -> dict:
+    """原 统计表登记信息生成 的逐文件写法（isclose/idxmax），作为对照。"""
+    result = dict.fromkeys(RESULT_COLUMNS, pd.NaT)
+    result['最大差异'] = np.nan
+    check_series = pd.to_numeric(pd.Series(check, dtype=object), errors='coerce')
+    dates_series = pd.to_datetime(pd.Series(dates, dtype=object), errors='coerce')
+    valid = check_series.notna() & dates_series.notna()
+    if valid.any():
+        chk = check_series[valid]
+        dts = dates_series[valid]
+        nonzero_mask = ~np.isclose(chk.values.astype(float), 0.0, atol=0.005)
+        if nonzero_mask.any():
+            nz_idx = chk.index[nonzero_mask]
+            result['首个差异日期'] = dts.loc[nz_idx[0]]
+            result['末个差异日期'] = dts.loc[nz_idx[-1]]
+            result['最大差异'] = chk.loc[chk.abs().idxmax()]
+    dts = dates_series.dropna()
+    if not dts.empty:
+        result['起始日期'], result['截止日期'] = dts.min(), dts.max()
+    return result
+
+
+def random_statement(rng, n):
+    # 整数差异制造并列最大值，±0.005 附近的值检验容差边界，空值/无法解析的日期混在其中
+    pool = [0, 0.0, 0.004, 0.005, 0.0051, -0.0051, 1, -1, 2, -2, 3.25, -3.25, None, 'x', '']
+    check = [pool[i] for i in rng.integers(0, len(pool), n)]
+    days = rng.integers(0, 60, n)
+    dates = [None if d >= 55 else 'bad' if d == 54 else str(pd.Timestamp('2020-01-01') + pd.Timedelta(days=int(d)))
+             for d in days]
+    return check, dates
+
+
+def assert_same(row, expected):
+    for col in ('首个差异日期', '末个差异日期', '起始日期', '截止日期'):
+        assert (pd.isna(row[col]) and pd.isna(expected[col])) or row[col] == expected[col], col
+    assert (np.isnan(row['最大差异']) and np.isnan(expected['最大差异'])) or row['最大差异'] == expected['最大差异']
+
+
+def test_stacked_groups_match_per_file_logic():
+    rng = np.random.default_rng(20261017)
+    statements = [random_statement(rng, int(n)) for n in rng.integers(0, 12, 400)]
+    check, dates, offsets = stack_groups([typed_columns(c, d) for c, d in statements])
+    assert offsets[-1] == sum(len(c) for c, _ in statements)
+    result = reconcile_balances(check, dates, offsets)
+    assert list(result.columns) == RESULT_COLUMNS and len(result) == len(statements)
+    for i, (c, d) in enumerate(statements):
+        assert_same(result.iloc[i], old_reconcile(c, d))
+
+
+def test_reconcile_frame_groups_rows_by_key():
+    rng = np.random.default_rng(7)
+    statements = {f'k{i}': random_statement(rng, int(rng.integers(1, 10))) for i in range(50)}
+    parts = [pd.DataFrame({'索引号': k, '公式校验': c, '日期': d}) for k, (c, d) in statements.items()]
+    df = pd.concat(parts, ignore_index=True)
+    df = df.iloc[np.argsort(rng.integers(0, 3, len(df)), kind='stable')]  # 打乱行顺序，各组的行交错；对照按打乱后的顺序
+    result = reconcile_frame(df, '索引号')
+    assert sorted(result.index) == sorted(statements)
+    for k in statements:
+        rows = df[df['索引号'] == k]
+        assert_same(result.loc[k], old_reconcile(rows['公式校验'].tolist(), rows['日期'].tolist()))
+
+
+def test_empty_inputs():
+    check, dates, offsets = stack_groups([])
+    assert offsets.tolist() == [0] and reconcile_balances(check, dates, offsets).empty
+    assert reconcile_frame(pd.DataFrame(), '索引号').empty
+    check, dates, offsets = stack_groups([typed_columns([], []), typed_columns([1.0], ['2020-01-01'])])
+    result = reconcile_balances(check, dates, offsets)
+    assert pd.isna(result.loc[0, '起始日期']) and result.loc[1, '最大差异'] == 1.0
@@ -0,0 +1,111 @@
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+from conftest import load_script, stale_dimension
+
+fb = load_script('公式余额重算.py')
+
+HEADER = ['本账号', '日期', '净流', '余额', '公式余额', '公式校验']
+
+
+def test_trailing_empty_rows_are_not_breaks():
+    rows = [HEADER,
+            ['A', 'd', 100, 100, None, None],
+            ['A', 'd', 50, 150, None, None],
+            ['A', 'd', -20, 130, None, None]]
+    rows += [[None] * 6 for _ in range(4)]
+    stats = fb.recompute_sheet(rows)
+    assert stats['行数'] == 3
+    assert stats['中断行'] == []
+    assert stats['差异行数'] == 0
+    assert [r[4] for r in rows[1:4]] == [100, 150, 130]
+
+
+def test_interior_blank_stops_the_chain():
+    rows = [HEADER,
+            ['A', 'd', 1, 1, None, None],
+            ['A', 'd', 2, 3, None, None],
+            ['A', 'd', None, 3, 'old', 'old'],
+            ['A', 'd', 4, 7, 'old', 'old'],
+            [None] * 6]
+    stats = fb.recompute_sheet(rows)
+    assert stats['中断行'] == [4]
+    assert stats['行数'] == 4
+    assert [r[4] for r in rows[1:5]] == [1, 3, 'old', 'old']
+
+
+def test_accounts_run_separate_chains():
+    net = np.array([100, 50, 10, -20, 5], dtype=float)
+    balance = np.array([100, 150, 500, 130, 506], dtype=float)
+    groups = fb.account_groups(['A', 'A', 'B', 'A', 'B'])
+    formula_balance, check, filled, breaks = fb.recompute(net, balance, groups)
+    assert formula_balance.tolist() == [100, 150, 500, 130, 505]
+    assert check.tolist() == [0, 0, 0, 0, 1]
+    assert filled.all() and breaks == []
+
+
+def test_styled_trailing_rows_in_workbook(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '提取'
+    ws.append(HEADER)
+    for r in (['A', 'd', 1, 1], ['A', 'd', 2, 3], ['A', 'd', 3, 6]):
+        ws.append(r)
+    for row in range(5, 9):
+        ws.cell(row=row, column=4).font = Font(bold=True)
+    path = tmp_path / 'a.xlsx'
+    wb.save(path)
+    result = fb.process_workbook(path, dry_run=True)
+    (title, stats), = result['sheets']
+    assert stats['中断行'] == [] and stats['行数'] == 3
+
+
+def make_book(path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '提取'
+    ws.append(HEADER)
+    ws.append(['A', 'd', 1, 1])
+    ws.append(['A', 'd', 2, 3])
+    wb.create_sheet('整理表').append(['交易币种'])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(path)
+    return path.read_bytes()
+
+
+def test_default_writes_to_output_folder(tmp_path):
+    src = tmp_path / 'sub' / 'a.xlsx'
+    original = make_book(src)
+    result = fb.process_in_folder(src, tmp_path)
+    assert result['written']
+    assert src.read_bytes() == original
+    out = tmp_path / fb.OUTPUT_DIR / 'sub' / 'a.xlsx'
+    (_, stats), = fb.process_workbook(out, dry_run=True)['sheets']
+    assert not stats['changed']
+    assert fb.find_workbooks(tmp_path) == [src]
+
+
+def test_in_place_keeps_backup(tmp_path):
+    src = tmp_path / 'a.xlsx'
+    original = make_book(src)
+    assert fb.process_in_folder(src, tmp_path, in_place=True)['written']
+    assert (tmp_path / 'a.xlsx.bak').read_bytes() == original
+    assert src.read_bytes() != original
+
+
+def test_stale_dimension_tag_keeps_every_row(tmp_path):
+    src = tmp_path / 'a.xlsx'
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '提取'
+    ws.append(HEADER)
+    for r in (['A', 'd', 1, 1], ['A', 'd', 2, 3], ['A', 'd', 3, 6], ['A', 'd', 4, 10], ['A', 'd', 5, 15]):
+        ws.append(r)
+    wb.save(src)
+    stale_dimension(src, 'A1:F2')
+    assert fb.process_in_folder(src, tmp_path, in_place=True)['written']
+    sheets, _ = fb.read_sheets(src)
+    (_, rows), = sheets
+    assert len(rows) == 6
+    assert [r[4] for r in rows[1:]] == [1, 3, 6, 10, 15]
@@ -0,0 +1,18 @@
+from 并行写出 import emit_workbooks, unique_file_names
+
+
+def _write_marker(path, name, prefix='', suffix=''):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'{prefix}{name}{suffix}')
+
+
+def test_unique_file_names_suffix_in_order():
+    assert unique_file_names(['a.xlsx', 'b.xlsx', 'a.xlsx', 'a.xlsx']) == ['a.xlsx', 'b.xlsx', 'a_2.xlsx', 'a_3.xlsx']
+
+
+def test_shared_kwargs_reach_every_task(tmp_path):
+    tasks = [(str(tmp_path / f'{i}.txt'), str(i)) for i in range(6)]
+    shared = {'prefix': '<', 'suffix': '>'}
+    for workers in (1, 2):
+        emit_workbooks(_write_marker, tasks, workers, shared=shared)
+        assert [open(p, encoding='utf-8').read() for p, _ in tasks] == [f'<{i}>' for i in range(6)]
@@ -0,0 +1,95 @@
+import sys
+
+import pandas as pd
+import pytest
+
+from conftest import load_script
+
+pj = load_script('提取表拼接')
+
+
+def make_source(path, rows):
+    pd.DataFrame({
+        '本账号': ['6222000000000001'] * rows,
+        '本卡号': [''] * rows,
+        '对手账/卡号': ['x'] * rows,
+        '净流': list(range(rows)),
+    }).to_excel(path, sheet_name='提取', index=False)
+
+
+def run(folder, monkeypatch, answer_inputs):
+    monkeypatch.setattr(sys, 'argv', ['提取表拼接', '--executor', 'thread', '--workers', '1', '--no-cache'])
+    answer_inputs([('文件夹路径', str(folder)), ('输出文件格式', '1')])
+    pj.main()
+
+
+def output_rows(folder):
+    df = pd.read_excel(folder / '流水汇总_1.xlsx', dtype=str)
+    return df.groupby('索引号').size().to_dict()
+
+
+def test_interrupted_write_is_redone(tmp_path, monkeypatch, answer_inputs):
+    make_source(tmp_path / 'A.xlsx', 2)
+    make_source(tmp_path / 'B.xlsx', 3)
+    run(tmp_path, monkeypatch, answer_inputs)
+    assert output_rows(tmp_path) == {'A': 2, 'B': 3}
+
+    # A 变化后写出中途崩溃
+    make_source(tmp_path / 'A.xlsx', 5)
+
+    def crash(*args, **kwargs):
+        raise RuntimeError('crash')
+    with monkeypatch.context() as m:
+        m.setattr(pj, 'write_output', crash)
+        with pytest.raises(RuntimeError):
+            run(tmp_path, monkeypatch, answer_inputs)
+    assert pj.load_manifest(str(tmp_path))['pending']
+
+    # 来源都没变，但上次的输出计划未完成：必须重新写出
+    run(tmp_path, monkeypatch, answer_inputs)
+    assert output_rows(tmp_path) == {'A': 5, 'B': 3}
+    manifest = pj.load_manifest(str(tmp_path))
+    assert 'pending' not in manifest
+    assert set(manifest['outputs']) == {'流水汇总_1.xlsx'}
+
+
+def test_unchanged_run_exits_early(tmp_path, monkeypatch, answer_inputs, capsys):
+    make_source(tmp_path / 'A.xlsx', 2)
+    run(tmp_path, monkeypatch, answer_inputs)
+    run(tmp_path, monkeypatch, answer_inputs)
+    assert '无需更新' in capsys.readouterr().out
+
+
+def test_frame_store_spill_names_do_not_collide(tmp_path):
+    store = pj.FrameStore(0, str(tmp_path))  # 预算为 0：全部落盘
+    try:
+        frames = {rel: pd.DataFrame({'v': [i]}) for i, rel in enumerate(['a', 'b', 'c'])}
+        store.put('a', frames['a'])
+        store.put('b', frames['b'])
+        store.discard(['a'])
+        store.put('c', frames['c'])
+        pd.testing.assert_frame_equal(store.get('b'), frames['b'])
+        pd.testing.assert_frame_equal(store.get('c'), frames['c'])
+        pd.testing.assert_frame_equal(store.group(['c', 'b']), pd.DataFrame({'v': [1, 2]}))
+    finally:
+        store.close()
+
+
+def test_plan_outputs_places_each_key_once():
+    # 中断后并回的计划：A 同时出现在旧输出（待删除）和新输出（待写出）中
+    old_outputs = {'流水汇总_1.xlsx': {'索引号': ['A', 'B'], 'part': None},
+                   '流水汇总_2.xlsx': {'索引号': ['A', 'C'], 'part': None}}
+    keep, write, delete = pj.plan_outputs({'A': 1, 'B': 1, 'C': 1}, old_outputs, {'A', 'B', 'C'}, 'xlsx')
+    keys = [k for spec in {**keep, **write}.values() for k in spec['索引号']]
+    assert sorted(keys) == ['A', 'B', 'C']
+
+
+def test_removing_every_source_cleans_outputs(tmp_path, monkeypatch, answer_inputs):
+    make_source(tmp_path / 'A.xlsx', 2)
+    run(tmp_path, monkeypatch, answer_inputs)
+    assert (tmp_path / '流水汇总_1.xlsx').exists()
+    (tmp_path / 'A.xlsx').unlink()
+    run(tmp_path, monkeypatch, answer_inputs)
+    assert not (tmp_path / '流水汇总_1.xlsx').exists()
+    manifest = pj.load_manifest(str(tmp_path))
+    assert manifest['sources'] == {} and manifest['outputs'] == {}
@@ -0,0 +1,44 @@
+import random
+
+from 数字匹配索引 import DigitIndex
+from conftest import load_script
+
+reg = load_script('统计表登记信息生成.py')
+
+
+def random_number(rng):
+    # 同一批 19 位卡号的首尾片段，配上分隔符和短号，制造包含/被包含/不足位数的各种情况
+    base = rng.choice(['6222021234567890123', '6217000011112222333', '6222021234500000000'])
+    start = rng.randrange(0, 10)
+    digits = base[start:start + rng.randrange(4, 20)] or base
+    if rng.random() < 0.3:
+        digits = ' '.join(digits[i:i + 4] for i in range(0, len(digits), 4))
+    return rng.choice(['', '账号']) + digits
+
+
+def test_match_equals_pairwise_digit_match():
+    rng = random.Random(17)
+    index = DigitIndex(min_len=12)
+    numbers = []
+    for _ in range(300):
+        number = random_number(rng)
+        numbers.append(number)
+        index.add(number, len(numbers) - 1)
+        query = random_number(rng)  # 边加边查：新后缀逐个插入排序表
+        expected = {i for i, n in enumerate(numbers) if reg.digit_match(query, n, 12)}
+        assert index.match(query) == expected, query
+    bulk = DigitIndex(min_len=12)
+    for i, number in enumerate(numbers):
+        bulk.add(number, i)
+    for _ in range(200):
+        query = random_number(rng)
+        assert bulk.match(query) == {i for i, n in enumerate(numbers) if reg.digit_match(query, n, 12)}
+
+
+def test_empty_and_short_queries():
+    index = DigitIndex(min_len=12)
+    index.add('6222 0212 3456 7890 123', item='a')
+    assert index.match('') == set() and index.match(None) == set()
+    assert index.match('34567890') == set()  # 不足 12 位只认完全相同
+    assert index.match('021234567890') == {'a'}
+    assert index.match('xx6222021234567890123yy') == {'a'}
@@ -0,0 +1,205 @@
+import os
+import re
+import uuid
+import threading
+from urllib.parse import urlparse, unquote
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import 流水入库 as lr
+
+
+def frames():
+    """第一块的 交易流水号 全是数字，第二块多出 备注 列、流水号含字母。"""
+    first = pd.DataFrame({
+        '索引号': ['a', 'a', 'a'],
+        '日期': pd.to_datetime(['2020-01-01', '2020-01-02', None]),
+        '交易流水号': [1001, 1002, 1003],
+        '净流': [1.5, -2.25, 3.0],
+    })
+    second = pd.DataFrame({
+        '索引号': ['b', 'b'],
+        '日期': ['2021-05-06', ''],
+        '交易流水号': ['TX-001', '00123'],
+        '净流': ['4.5', ''],
+        '备注': ['退款', None],
+    })
+    return first, second
+
+
+EXPECTED = [
+    ('a', '2020-01-01 00:00:00', '1001', '1.50', None),
+    ('a', '2020-01-02 00:00:00', '1002', '-2.25', None),
+    ('a', None, '1003', '3.00', None),
+    ('b', '2021-05-06 00:00:00', 'TX-001', '4.50', '退款'),
+    ('b', None, '00123', None, None),
+]
+
+
+# =========================
+# 脚本化的连接：记录表结构与写入的行，列不存在时与服务器一样报错
+# =========================
+class FakeServer:
+    def __init__(self, local_infile: int):
+        self.local_infile = local_infile
+        self.columns = {}
+        self.rows = []
+        self.exists = False
+        self.lock = threading.Lock()
+
+    def check(self, cols):
+        unknown = [c for c in cols if c not in self.columns]
+        if unknown:
+            raise RuntimeError(f"Unknown column '{unknown[0]}' in 'field list'")
+
+    def add(self, cols, values):
+        self.check(cols)
+        with self.lock:
+            self.rows.extend(dict(zip(cols, row)) for row in values)
+
+
+def _names(text: str) -> list:
+    return [n.replace('``', '`') for n in re.findall(r'`((?:[^`]|``)+)`', text)]
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, args=None):
+        server = self.server
+        if sql.startswith('CREATE TABLE'):
+            if not server.exists:
+                server.exists = True
+                for name, kind in re.findall(r'`((?:[^`]|``)+)` (\S+) NULL', sql):
+                    server.columns[name] = kind
+        elif sql.startswith('SHOW COLUMNS'):
+            self.result = [(name,) for name in server.columns]
+        elif sql.startswith('ALTER TABLE'):
+            name, kind = re.search(r'ADD COLUMN `((?:[^`]|``)+)` (\S+) NULL', sql).groups()
+            server.columns[name] = kind
+        elif sql.startswith('SELECT @@local_infile'):
+            self.result = [(server.local_infile,)]
+        elif sql.startswith('LOAD DATA'):
+            cols = _names(sql[sql.rindex('('):])
+            with open(args[0], encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            values = [[None if v == '\\N' else v for v in line.split('\t')] for line in lines]
+            server.add(cols, values)
+        else:
+            raise AssertionError(sql)
+        return 0
+
+    def executemany(self, sql, rows):
+        assert sql.startswith('INSERT INTO')
+        self.server.add(_names(sql[sql.index('('):sql.index('VALUES')]), rows)
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self):
+        return FakeCursor(self.server)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _as_text(v):
+    """INSERT 路径写入的是 Python 值，统一成 LOAD DATA 的文本形式再比较。"""
+    if v is None:
+        return None
+    if isinstance(v, float):
+        return f'{v:.2f}'
+    if hasattr(v, 'strftime'):
+        return v.strftime('%Y-%m-%d %H:%M:%S')
+    return str(v)
+
+
+def _sort_key(row):
+    return tuple('' if v is None else v for v in row)
+
+
+@pytest.mark.parametrize('local_infile', [1, 0])
+def test_later_chunks_add_columns_and_keep_name_based_types(monkeypatch, local_infile):
+    server = FakeServer(local_infile)
+    monkeypatch.setattr(lr, 'connect', lambda settings, local_infile=False: FakeConnection(server))
+    loader = lr.MySQLLoader({'table': '提取明细', 'loaders': 2, 'chunk_rows': 2})
+    for df in frames():
+        loader.put(df)
+    rows, _ = loader.close()
+
+    assert rows == 5
+    assert server.columns == {'索引号': 'VARCHAR(255)', '日期': 'DATETIME', '交易流水号': 'VARCHAR(128)',
+                              '净流': 'DECIMAL(20,2)', '备注': 'TEXT'}
+    loaded = [tuple(_as_text(r.get(c)) for c in ('索引号', '日期', '交易流水号', '净流', '备注')) for r in server.rows]
+    assert sorted(loaded, key=_sort_key) == sorted(EXPECTED, key=_sort_key)
+
+
+def test_conform_frame_types_follow_column_names():
+    df = pd.DataFrame({'交易流水号': [1.0, np.nan, 123456789012.0], '余额': ['1,5', '2.345', None]})
+    out = lr.conform_frame(df)
+    assert out['交易流水号'].tolist()[0::2] == ['1', '123456789012'] and pd.isna(out['交易流水号'][1])
+    assert np.isnan(out['余额'][0]) and out['余额'][1] == 2.35 and np.isnan(out['余额'][2])
+
+
+# =========================
+# 真实的 MySQL/MariaDB：设置 JA_TEST_MYSQL_DSN=mysql://用户:密码@主机:端口/库 时运行
+# =========================
+@pytest.mark.skipif(not os.environ.get('JA_TEST_MYSQL_DSN') or lr.pymysql is None,
+                    reason='未设置 JA_TEST_MYSQL_DSN 或未安装 pymysql')
+def test_load_into_live_mysql():
+    dsn = urlparse(os.environ['JA_TEST_MYSQL_DSN'])
+    settings = {
+        'host': dsn.hostname or 'localhost', 'port': dsn.port or 3306,
+        'user': unquote(dsn.username or 'root'), 'password': unquote(dsn.password or ''),
+        'database': dsn.path.lstrip('/'), 'table': f'提取明细_{uuid.uuid4().hex[:8]}',
+        'loaders': 2, 'chunk_rows': 2,
+    }
+    loader = lr.MySQLLoader(settings)
+    try:
+        for df in frames():
+            loader.put(df)
+        assert loader.close()[0] == 5
+        conn = lr.connect(settings)
+        try:
+            with conn.cursor() as cur:
+                table = lr.quote_name(settings['table'])
+                cur.execute(f"SHOW COLUMNS FROM {table}")
+                types = {row[0]: row[1].lower() for row in cur.fetchall()}
+                cur.execute(f"SELECT `交易流水号`, `备注` FROM {table} WHERE `索引号` = 'b' ORDER BY `交易流水号`")
+                assert cur.fetchall() == (('00123', None), ('TX-001', '退款'))
+            assert types['交易流水号'] == 'varchar(128)' and types['净流'] == 'decimal(20,2)'
+            assert lr.delete_keys(settings, {'a', 'b'}) == 5
+        finally:
+            conn.close()
+    finally:
+        conn = lr.connect(settings)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {lr.quote_name(settings['table'])}")
+            conn.commit()
+        finally:
+            conn.close()
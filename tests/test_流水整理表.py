@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from 流水整理表 import split_date_time, build_arranged_rows
+
+COLUMNS = ["账户名", "交易卡号", "交易账号", "交易日期", "交易时间", "交易金额", "流入", "流出", "净流", "余额",
+           "公式余额", "公式校验", "收付标志", "交易对手账卡号", "对手户名", "对手开户银行", "摘要说明", "交易币种",
+           "备注", "查询反馈结果原因", "选取"]
+
+
+def test_split_date_time_needs_exactly_two_parts():
+    dates, times = split_date_time(pd.Series(['2020-01-02 10:00:00', '2020-01-03', None]))
+    assert dates.tolist() == ['2020-01-02', '', ''] and times.tolist() == ['10:00:00', '', '']
+
+
+def test_build_arranged_rows_signs_amounts_and_joins_summaries():
+    df = pd.DataFrame({
+        '交易卡号': ['c1', 'c2', 'c3'], '交易账号': ['a1', 'a2', 'a3'],
+        '交易日期': ['d'] * 3, '交易时间': ['t'] * 3,
+        '交易金额': ['10.5', '3', ''], '收付标志': ['进', '出', '进'], '交易余额': ['1', '2', '3'],
+        '交易对手账卡号': ['x'] * 3, '对手户名': ['y'] * 3, '对手开户银行': ['z'] * 3, '交易币种': ['人民币'] * 3,
+        '摘要': ['工资', None, '转账'], '摘要2': ['一月', '利息', None],
+    })
+    out = build_arranged_rows(df, pd.Series(['张三'] * 3), COLUMNS)
+    assert list(out.columns) == COLUMNS
+    assert out['净流'].tolist() == [10.5, -3.0, '']
+    assert out['流入'].tolist() == ['10.5', '', ''] and out['流出'].tolist() == ['', '3', '']
+    assert out['摘要说明'].tolist() == ['工资 一月', 'nan 利息', '转账 nan']
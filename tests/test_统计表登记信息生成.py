@@ -0,0 +1,184 @@
+import os
+import sys
+import logging
+import shutil
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from conftest import load_script, stale_dimension
+
+reg = load_script('统计表登记信息生成.py')
+
+
+def make_folder(folder):
+    folder.mkdir()
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '统计表'
+    for _ in range(4):
+        ws.append([])
+    ws.append(['已取序号手动添加', '账号', '卡号'])
+    ws.append([1, '622200000000000001', None])
+    ws.append([3, None, '6222000000000099'])
+    wb.save(folder / '统计表.xlsx')
+    for i in range(6):
+        acc = f'62220000000000000{i}'
+        tiqu = pd.DataFrame({
+            '本账号名称': ['张三'] * 3 if i != 5 else [None] * 3,
+            '本账号': [acc] * 3,
+            '本卡号': ['6222000000000099' if i == 2 else f'6222{i}'] * 3,
+            '公式校验': [0, 1.5 if i % 2 else 0, -3],
+            '日期': ['2020-01-05', '2020-03-01', '2021-02-01'],
+        })
+        with pd.ExcelWriter(folder / f'f{i}.xlsx') as w:
+            tiqu.to_excel(w, sheet_name='提取', index=False)
+            pd.DataFrame({'交易币种': ['人民币']}).to_excel(w, sheet_name='整理表', index=False)
+    (folder / 'bad.xlsx').write_text('x')
+
+
+def run(folder, monkeypatch, answer_inputs, *extra):
+    monkeypatch.setattr(sys, 'argv', ['统计表登记信息生成', '--executor', 'thread', '--workers', '1',
+                                      '--no-cache', *extra])
+    answer_inputs([('统计表路径', str(folder / '统计表.xlsx')), ('存放路径', str(folder)),
+                   ('取得时间', '2026.10'), ('编制人', '某人')])
+    reg.main()
+
+
+def snapshot(folder):
+    rows = pd.read_excel(folder / reg.OUTPUT_FILE_NAME, dtype=str).fillna('')
+    rows = rows.drop(columns=['取得时间']).sort_values('文件名').reset_index(drop=True)
+    placed = {d: sorted(os.listdir(folder / d))
+              for d in (reg.SUBDIR_REGISTERED, reg.SUBDIR_SKIPPED, reg.SUBDIR_DUPLICATE)}
+    return rows, placed
+
+
+@pytest.fixture
+def reference(tmp_path, monkeypatch, answer_inputs):
+    folder = tmp_path / 'reference'
+    make_folder(folder)
+    run(folder, monkeypatch, answer_inputs)
+    return snapshot(folder)
+
+
+def test_serials_and_placement(reference):
+    rows, placed = reference
+    serials = dict(zip(rows['文件名'], rows['已取序号']))
+    assert serials['0001、f1(2026.10).xlsx'] == '已取序号1'
+    assert serials['0003、f2(2026.10).xlsx'] == '已取序号3'
+    assert placed[reg.SUBDIR_SKIPPED] == ['bad.xlsx', 'f5.xlsx']
+    assert len(placed[reg.SUBDIR_REGISTERED]) == 3
+
+
+def test_resume_after_crash_matches_uninterrupted_run(tmp_path, monkeypatch, answer_inputs, reference):
+    folder = tmp_path / 'crash'
+    make_folder(folder)
+    original = reg.rename_and_move
+    calls = []
+
+    def crash_on_third(*args):
+        calls.append(args)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return original(*args)
+
+    with monkeypatch.context() as m:
+        m.setattr(reg, 'rename_and_move', crash_on_third)
+        with pytest.raises(KeyboardInterrupt):
+            run(folder, monkeypatch, answer_inputs)
+    assert (folder / reg.JOURNAL_FILE_NAME).exists()
+    assert not (folder / reg.OUTPUT_FILE_NAME).exists()
+
+    # 不带 --resume 拒绝运行，避免重复分配序号
+    run(folder, monkeypatch, answer_inputs)
+    assert not (folder / reg.OUTPUT_FILE_NAME).exists()
+
+    run(folder, monkeypatch, answer_inputs, '--resume')
+    assert not (folder / reg.JOURNAL_FILE_NAME).exists()
+    rows, placed = snapshot(folder)
+    ref_rows, ref_placed = reference
+    pd.testing.assert_frame_equal(rows, ref_rows)
+    assert placed == ref_placed
+
+
+def test_unexpected_error_skips_only_that_file(tmp_path, monkeypatch, answer_inputs, reference):
+    folder = tmp_path / 'error'
+    make_folder(folder)
+    original = reg.reconcile_balances
+
+    def fail_for_short_check(check, dates, offsets):
+        if check[1] == 1.5:  # f1、f3
+            raise ValueError('boom')
+        return original(check, dates, offsets)
+
+    monkeypatch.setattr(reg, 'reconcile_balances', fail_for_short_check)
+    run(folder, monkeypatch, answer_inputs)
+    rows, placed = snapshot(folder)
+    notes = dict(zip(rows['文件名'], rows['*详细说明']))
+    assert notes['f1.xlsx'] == reg.ERROR_NOTE
+    assert notes['f3.xlsx'] == reg.ERROR_NOTE
+    assert placed[reg.SUBDIR_SKIPPED] == ['bad.xlsx', 'f1.xlsx', 'f3.xlsx', 'f5.xlsx']
+    assert not (folder / reg.JOURNAL_FILE_NAME).exists()
+
+
+def test_serial_allocator_fills_gaps_first():
+    serials = reg.SerialAllocator([2, 3, 6])
+    assert [serials.allocate() for _ in range(5)] == [1, 4, 5, 7, 8]
+    assert len(serials) == 8
+
+
+def test_slowest_files_ignore_queue_wait():
+    def timer(**seconds):
+        t = reg.StageTimer()
+        for stage, value in seconds.items():
+            t.add(stage, value)
+        return t
+
+    profiles = [('slow.xlsx', 10, timer(读取提取=5.0)),
+                ('queued.xlsx', 10, timer(读取提取=0.1, 排队等待=4.9)),
+                ('fast.xlsx', 10, timer(读取提取=0.2))]
+    report = reg.build_run_report(profiles, 5.0, 'thread', 1)
+    assert [item['file'] for item in report['slowest']] == ['slow.xlsx', 'fast.xlsx', 'queued.xlsx']
+    queued = report['slowest'][2]
+    assert queued['total'] == 0.1 and queued['queue_wait'] == 4.9
+    assert '排队等待' not in queued['stages']
+    assert report['stages']['排队等待']['max'] == 4.9
+
+
+def test_stale_dimension_tags_keep_serials_and_rows(tmp_path):
+    stats = tmp_path / '统计表.xlsx'
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '统计表'
+    for _ in range(4):
+        ws.append([])
+    ws.append(['已取序号手动添加', '账号', '卡号'])
+    for serial in (1, 2, 3, 4):
+        ws.append([serial, f'62220000000000000{serial}', None])
+    wb.save(stats)
+    stale_dimension(stats, 'A1:C6')
+    allocator, account_serial, _ = reg.read_statistics_info(stats, logging.getLogger('test'))
+    assert allocator.allocate() == 5
+    assert account_serial['622200000000000004'] == 4
+
+    out = tmp_path / reg.OUTPUT_FILE_NAME
+    rows = [reg.OUTPUT_HEADERS] + [[f'f{i}.xlsx'] + [None] * (len(reg.OUTPUT_HEADERS) - 1) for i in range(5)]
+    reg.save_output_book(out, [('Sheet', rows)])
+    stale_dimension(out, 'A1:A2')
+    (title, read_rows), = reg.read_output_rows(out)[0]
+    assert [r[0] for r in read_rows] == [reg.OUTPUT_HEADERS[0]] + [f'f{i}.xlsx' for i in range(5)]
+
+
+def test_fuzzy_serial_lookup_uses_statistics_index():
+    accounts = {'6222021234567890123': 7}
+    cards = {'6217000011112222333': 9}
+    fuzzy = reg.build_serial_index(accounts, cards, 12)
+    serials = reg.SerialAllocator([7, 9])
+    # 12 位以上的尾段与统计表中的卡号数字匹配：按重复处理，沿用原序号
+    assert reg.assign_serial('021234567890123', [], serials, accounts, cards, fuzzy) == (7, True)
+    assert reg.assign_serial('1111', ['0000 1111 2222 333'], serials, accounts, cards, fuzzy) == (9, True)
+    # 不使用数字匹配时是新账号；新分配的号码随即加入索引
+    assert reg.assign_serial('021234567890123', [], serials, dict(accounts), dict(cards)) == (1, False)
+    assert reg.assign_serial('9999888877776666', [], serials, accounts, cards, fuzzy) == (2, False)
+    assert reg.assign_serial('999888877776666', [], serials, accounts, cards, fuzzy) == (2, True)
@@ -0,0 +1,58 @@
+import os
+import sqlite3
+
+from openpyxl import Workbook
+
+from conftest import load_script, stale_dimension
+
+cz = load_script('账卡号查重')
+
+
+def test_full_reset_is_rolled_back_without_commit(tmp_path):
+    path = tmp_path / 'index.sqlite'
+    index = cz.DedupeIndex(path)
+    index.put('a.xlsx', os.stat(path), 'sha1', ['6222000000000001'], [])
+    index.close()
+
+    # --dry-run --full：重置后不提交，索引保持上次的状态
+    index = cz.DedupeIndex(path, reset=True)
+    assert index.paths() == set()
+    index.close(commit=False)
+    index = cz.DedupeIndex(path)
+    assert index.paths() == {'a.xlsx'}
+    assert index.closure({'a.xlsx'}) == {'a.xlsx'}
+    index.close()
+
+    # --full：提交后清空
+    cz.DedupeIndex(path, reset=True).close()
+    index = cz.DedupeIndex(path)
+    assert index.paths() == set()
+    index.close()
+
+
+def test_stale_dimension_tag_reads_every_value(tmp_path):
+    path = tmp_path / 'a.xlsx'
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '提取'
+    ws.append(['日期', '本账号', '本卡号'])
+    for i in range(1, 6):
+        ws.append(['d', f'62220000000000{i:02d}', f'6217 0000 0000 00{i:02d}'])
+    wb.save(path)
+    stale_dimension(path, 'A1:C2')
+    accounts, cards = cz.read_account_values(path)
+    assert accounts == [f'62220000000000{i:02d}' for i in range(1, 6)]
+    assert cards == [f'62170000000000{i:02d}' for i in range(1, 6)]
+
+
+def test_index_from_older_reader_is_reread(tmp_path):
+    path = tmp_path / 'index.sqlite'
+    index = cz.DedupeIndex(path)
+    index.put('a.xlsx', os.stat(path), 'sha1', ['6222000000000001'], [])
+    index.close()
+    with sqlite3.connect(path) as conn:
+        conn.execute("DELETE FROM meta WHERE key = 'reader'")  # 旧版索引没有记录读取规则版本
+    index = cz.DedupeIndex(path)
+    assert index.paths() == set()
+    assert index.get_meta('reader') == cz.READER_VERSION
+    index.close()